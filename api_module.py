@@ -2,36 +2,70 @@
 Módulo de manejo de API para el Sistema de Asistencia JOLG
 """
 
+import hashlib
 import os
 import requests
+from contextlib import nullcontext
 from datetime import datetime
 from PyQt5.QtCore import QThread, pyqtSignal
 
+from dto import AsistenciaRecord, PERSONAL_ID_MAP, json_dumps
+from transport_module import get_transport
+from upload_module import ChunkedUploader, ChunkedUploadUnsupported
+
+# Compatibilidad: LocalStorage vive ahora en storage_module
+from storage_module import LocalStorage  # noqa: F401
+
 
 class APIClient:
     """Cliente para manejar las llamadas a la API"""
     
-    def __init__(self):
-        self.base_url = "https://backend-admin.consorciolorenzo.com"
-        self.upload_endpoint = f"{self.base_url}/files/file"
-        self.asistencia_endpoint = f"{self.base_url}/asistencias_jolg"
-        self.timeout = 30
+    def __init__(self, transport=None):
+        # Todas las instancias comparten el pool de conexiones del proceso
+        self.transport = transport or get_transport()
+        self.base_url = self.transport.base_url
+        self.upload_endpoint = f"{self.base_url}{self.transport.upload_path}"
+        self.asistencia_endpoint = f"{self.base_url}{self.transport.asistencia_path}"
+        self.batch_endpoint = f"{self.base_url}{self.transport.batch_path}"
+        self.batch_size = self.transport.batch_size
+        self.batch_max_bytes = self.transport.batch_max_bytes
+        self.chunked_endpoint = f"{self.base_url}{self.transport.chunked_path}"
     
-    def upload_file(self, file_path):
+    def _send(self, method, url, endpoint, idempotency_key=None, **kwargs):
+        """
+        Envía una petición; con clave de idempotencia la agrega como
+        encabezado Idempotency-Key y permite duplicarla (hedging)
+        """
+        if idempotency_key is None:
+            return self.transport.request(method, url, endpoint=endpoint, **kwargs)
+        headers = dict(kwargs.get("headers") or {})
+        headers["Idempotency-Key"] = idempotency_key
+        kwargs["headers"] = headers
+        return self.transport.hedged_request(method, url, endpoint=endpoint, **kwargs)
+    
+    def upload_file(self, file_path, data=None, idempotency_key=None):
         """
         Sube un archivo al servidor
         
         Args:
             file_path (str): Ruta del archivo a subir
+            data (bytes): Contenido ya en memoria; si se indica, no se abre
+                file_path (solo se usa su nombre)
+            idempotency_key (str): Clave para que el servidor descarte reintentos
             
         Returns:
             tuple: (success: bool, result: str or dict)
         """
         try:
-            if not os.path.exists(file_path):
+            if data is None and not os.path.exists(file_path):
                 return False, "Archivo no encontrado"
             
-            with open(file_path, 'rb') as file:
+            if data is None and idempotency_key and self.transport.should_hedge("upload"):
+                # Una petición duplicada no puede compartir el archivo abierto
+                with open(file_path, 'rb') as file:
+                    data = file.read()
+            
+            with (open(file_path, 'rb') if data is None else nullcontext(data)) as file:
                 files = {
                     'file': (os.path.basename(file_path), file, 'image/jpeg')
                 }
@@ -40,11 +74,13 @@ class APIClient:
                     'accept': '*/*'
                 }
                 
-                response = requests.put(
+                response = self._send(
+                    "PUT",
                     self.upload_endpoint,
+                    "upload",
+                    idempotency_key,
                     files=files,
-                    headers=headers,
-                    timeout=self.timeout
+                    headers=headers
                 )
                 
                 response.raise_for_status()
@@ -60,7 +96,52 @@ class APIClient:
         except Exception as e:
             return False, f"Error inesperado: {str(e)}"
     
-    def register_asistencia(self, personal_id, observaciones, foto_ruta, fecha_hora=None):
+    def upload_photo(self, file_path, on_progress=None, data=None, idempotency_key=None):
+        """
+        Sube una foto por fragmentos reanudables si el servidor lo permite
+        
+        Con api.upload_mode "auto" se intenta la subida por fragmentos y, si
+        el servidor no la tiene, se recuerda y se usa upload_file.
+        
+        Args:
+            file_path (str): Ruta de la foto
+            on_progress (callable): on_progress(porcentaje: int)
+            data (bytes): JPEG ya codificado en memoria; se sube sin leer
+                file_path, que puede no existir todavía
+            idempotency_key (str): Clave para la subida en un solo PUT (la
+                subida por fragmentos ya es idempotente por su ID de contenido)
+            
+        Returns:
+            tuple: (success: bool, result: str or dict)
+        """
+        mode = self.transport.upload_mode
+        if mode == "single" or (mode == "auto" and self.transport.chunked_supported is False):
+            return self.upload_file(file_path, data, idempotency_key)
+        
+        uploader = ChunkedUploader(
+            self.transport,
+            self.chunked_endpoint,
+            state_dir=self.transport.chunk_state_dir,
+            chunk_size=self.transport.chunk_size,
+            retries=self.transport.chunk_retries,
+            confirmed=self.transport.chunked_supported is True
+        )
+        try:
+            success, result = uploader.upload(file_path, on_progress, data)
+            if success:
+                self.transport.chunked_supported = True
+            return success, result
+        except ChunkedUploadUnsupported as e:
+            if e.permanent:
+                self.transport.chunked_supported = False
+            if mode == "chunked":
+                return False, f"El servidor no acepta subida por fragmentos: {str(e)}"
+            return self.upload_file(file_path, data, idempotency_key)
+        except Exception as e:
+            return False, f"Error inesperado: {str(e)}"
+    
+    def register_asistencia(self, personal_id, observaciones, foto_ruta, fecha_hora=None,
+                            idempotency_key=None):
         """
         Registra asistencia en el servidor
         
@@ -69,6 +150,8 @@ class APIClient:
             observaciones (str): Observaciones
             foto_ruta (str): Ruta de la foto subida
             fecha_hora (str): Fecha y hora de registro
+            idempotency_key (str): Clave del registro local; reintentos con la
+                misma clave no crean asistencias duplicadas
             
         Returns:
             tuple: (success: bool, result: str or dict)
@@ -79,13 +162,9 @@ class APIClient:
                 fecha_hora = datetime.now().strftime("%Y-%m-%dT%H:%M:%S") + "Z"
             
             # Convertir personalID a número según la tienda
-            personal_id_map = {
-                "TIENDA1": 1,
-                "TIENDA2": 2, 
-                "TIENDA3": 3
-            }
-            
-            personal_id_num = personal_id_map.get(personal_id, 1)
+            if personal_id not in PERSONAL_ID_MAP:
+                return False, f"Personal ID desconocido: {personal_id}"
+            personal_id_num = PERSONAL_ID_MAP[personal_id]
             
             data = {
                 "personalID": personal_id_num,  # Ahora es número
@@ -101,11 +180,13 @@ class APIClient:
             
             print(f"DEBUG: Enviando datos: {data}")  # Para debug
             
-            response = requests.post(
+            response = self._send(
+                "POST",
                 self.asistencia_endpoint,
+                "register",
+                idempotency_key,
                 json=data,
-                headers=headers,
-                timeout=self.timeout
+                headers=headers
             )
             
             print(f"DEBUG: Response status: {response.status_code}")  # Para debug
@@ -118,6 +199,174 @@ class APIClient:
             return False, f"Error de conexión: {str(e)}"
         except Exception as e:
             return False, f"Error inesperado: {str(e)}"
+    
+    def register_record(self, record, foto_ruta):
+        """
+        Registra en el servidor un registro local ya guardado
+        
+        Args:
+            record (AsistenciaRecord or dict): Registro local
+            foto_ruta (str): Ruta de la foto subida
+            
+        Returns:
+            tuple: (success: bool, result: str or dict)
+        """
+        try:
+            if not isinstance(record, AsistenciaRecord):
+                record = AsistenciaRecord.from_dict(record)
+            
+            headers = {
+                'accept': 'application/json',
+                'Content-Type': 'application/json'
+            }
+            
+            response = self._send(
+                "POST",
+                self.asistencia_endpoint,
+                "register",
+                record.idempotency_key(),
+                data=json_dumps(record.to_api_payload(foto_ruta)),
+                headers=headers
+            )
+            
+            response.raise_for_status()
+            return True, response.json() if response.content else "Asistencia registrada"
+            
+        except requests.exceptions.RequestException as e:
+            return False, f"Error de conexión: {str(e)}"
+        except Exception as e:
+            return False, f"Error inesperado: {str(e)}"
+
+    
+    def _group_batches(self, bodies):
+        """Agrupa cuerpos JSON serializados respetando tamaño y bytes por lote"""
+        batches = []
+        current = []
+        current_bytes = 0
+        for index, body in enumerate(bodies):
+            if current and (len(current) >= self.batch_size or
+                            current_bytes + len(body) + 1 > self.batch_max_bytes):
+                batches.append(current)
+                current = []
+                current_bytes = 0
+            current.append(index)
+            current_bytes += len(body) + 1
+        if current:
+            batches.append(current)
+        return batches
+    
+    def _post_batch(self, bodies, keys):
+        """
+        Envía un lote en una sola petición
+        
+        Cada elemento lleva la clave de idempotencia de su registro
+        (idempotencyKey), así un registro reenviado en otro lote o en un
+        POST individual no se duplica. La clave del lote se deriva de esas
+        claves: reenviar el mismo lote usa la misma clave.
+        
+        El lote solo cuenta como recibido si la respuesta trae una lista
+        con un resultado por registro. Cualquier otra respuesta 2xx (una
+        ruta comodín o un proxy que contesta a todo), un 4xx (salvo
+        408/409/429) o un 501 se toman como falta de soporte.
+        
+        Returns:
+            list or None: (success, result) por registro, o None si el
+            servidor no tiene endpoint de lotes
+        """
+        headers = {
+            'accept': 'application/json',
+            'Content-Type': 'application/json'
+        }
+        try:
+            batch_key = hashlib.sha256("\n".join(keys).encode("utf-8")).hexdigest()
+            response = self._send(
+                "POST",
+                self.batch_endpoint,
+                "register",
+                batch_key,
+                data=b"[" + b",".join(bodies) + b"]",
+                headers=headers
+            )
+            if response.status_code == 501 or (
+                    400 <= response.status_code < 500 and
+                    response.status_code not in (408, 409, 429)):
+                self.transport.batch_supported = False
+                return None
+            
+            response.raise_for_status()
+            try:
+                items = response.json()
+            except ValueError:
+                items = None
+        except requests.exceptions.RequestException as e:
+            return [(False, f"Error de conexión: {str(e)}")] * len(bodies)
+        except Exception as e:
+            return [(False, f"Error inesperado: {str(e)}")] * len(bodies)
+        
+        if not isinstance(items, list) or len(items) != len(bodies):
+            # Sin un resultado por registro no se sabe qué se guardó: se
+            # envían uno por uno (las claves de idempotencia evitan duplicados)
+            self.transport.batch_supported = False
+            return None
+        self.transport.batch_supported = True
+        
+        results = []
+        for item in items:
+            failed = isinstance(item, dict) and (
+                "error" in item or item.get("status", 200) >= 400)
+            results.append((not failed, item))
+        return results
+    
+    def register_many(self, items):
+        """
+        Registra varias asistencias agrupándolas en lotes
+        
+        Usa el endpoint de lotes si el servidor lo tiene; si responde que
+        no existe, se recuerda para el resto del proceso y se envía cada
+        registro por separado. Cada elemento del lote incluye la clave de
+        idempotencia de su registro.
+        
+        Args:
+            items (list): Tuplas (record, foto_ruta); record puede ser
+                AsistenciaRecord o diccionario
+            
+        Returns:
+            list: (success: bool, result) por registro, en el mismo orden
+        """
+        results = [None] * len(items)
+        records = []
+        bodies = []
+        for index, (record, foto_ruta) in enumerate(items):
+            try:
+                if not isinstance(record, AsistenciaRecord):
+                    record = AsistenciaRecord.from_dict(record)
+                payload = record.to_api_payload(foto_ruta)
+                payload["idempotencyKey"] = record.idempotency_key()
+                bodies.append(json_dumps(payload))
+                records.append((index, record, foto_ruta))
+            except Exception as e:
+                results[index] = (False, f"Registro inválido: {str(e)}")
+        
+        if len(records) > 1 and self.transport.batch_supported is not False:
+            for batch in self._group_batches(bodies):
+                if self.transport.batch_supported is False:
+                    # Otro lote (u otro hilo) descubrió que no hay endpoint
+                    batch_results = None
+                else:
+                    batch_results = self._post_batch(
+                        [bodies[i] for i in batch],
+                        [records[i][1].idempotency_key() for i in batch])
+                for position, i in enumerate(batch):
+                    index, record, foto_ruta = records[i]
+                    if batch_results is None:
+                        results[index] = self.register_record(record, foto_ruta)
+                    else:
+                        results[index] = batch_results[position]
+            return results
+        
+        for index, record, foto_ruta in records:
+            results[index] = self.register_record(record, foto_ruta)
+        return results
 
 
 class AsistenciaWorker(QThread):
@@ -125,34 +374,48 @@ class AsistenciaWorker(QThread):
     
     finished = pyqtSignal(bool, str)  # success, message
     progress = pyqtSignal(str)  # status message
+    percent = pyqtSignal(int)  # avance de la subida de la foto (0-100)
     
-    def __init__(self, personal_id, observaciones, foto_path):
+    def __init__(self, personal_id, observaciones, foto_path, foto_data=None,
+                 idempotency_key=None, foto_ruta=None, api_client=None):
         super().__init__()
         self.personal_id = personal_id
         self.observaciones = observaciones
         self.foto_path = foto_path
-        self.api_client = APIClient()
+        # Con foto_data la foto se sube desde memoria (foto_path puede no existir aún)
+        self.foto_data = foto_data
+        # Clave del registro local: el mismo registro nunca se duplica en el servidor
+        self.idempotency_key = idempotency_key
+        # Con foto_ruta la foto ya se subió (subida anticipada) y solo se registra
+        self.foto_ruta = foto_ruta
+        self.api_client = api_client or APIClient()
     
     def run(self):
         """Ejecuta el proceso de registro de asistencia"""
         try:
             # Paso 1: Subir archivo
-            self.progress.emit("Subiendo foto...")
-            success, result = self.api_client.upload_file(self.foto_path)
-            
-            if not success:
-                self.finished.emit(False, f"Error subiendo foto: {result}")
-                return
-            
-            foto_ruta = result
-            self.progress.emit("Foto subida exitosamente...")
+            if self.foto_ruta:
+                foto_ruta = self.foto_ruta
+            else:
+                self.progress.emit("Subiendo foto...")
+                success, result = self.api_client.upload_photo(
+                    self.foto_path, self._upload_progress, self.foto_data,
+                    f"{self.idempotency_key}:foto" if self.idempotency_key else None)
+                
+                if not success:
+                    self.finished.emit(False, f"Error subiendo foto: {result}")
+                    return
+                
+                foto_ruta = result
+                self.progress.emit("Foto subida exitosamente...")
             
             # Paso 2: Registrar asistencia
             self.progress.emit("Registrando asistencia...")
             success, result = self.api_client.register_asistencia(
                 self.personal_id,
                 self.observaciones,
-                foto_ruta
+                foto_ruta,
+                idempotency_key=self.idempotency_key
             )
             
             if success:
@@ -162,66 +425,8 @@ class AsistenciaWorker(QThread):
                 
         except Exception as e:
             self.finished.emit(False, f"Error inesperado: {str(e)}")
-
-
-class LocalStorage:
-    """Maneja el almacenamiento local de registros"""
-    
-    def __init__(self, storage_file="asistencia_local.json"):
-        self.storage_file = storage_file
-    
-    def save_record(self, personal_id, observaciones, foto_path, sent=False):
-        """Guarda un registro localmente"""
-        import json
-        
-        record = {
-            "timestamp": datetime.now().isoformat(),
-            "personalID": personal_id,
-            "observaciones": observaciones,
-            "foto_path": foto_path,
-            "sent": sent
-        }
-        
-        records = self.load_records()
-        records.append(record)
-        
-        try:
-            with open(self.storage_file, 'w', encoding='utf-8') as f:
-                json.dump(records, f, indent=2, ensure_ascii=False)
-            return True
-        except Exception:
-            return False
-    
-    def load_records(self):
-        """Carga registros desde archivo local"""
-        import json
-        
-        if not os.path.exists(self.storage_file):
-            return []
-        
-        try:
-            with open(self.storage_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception:
-            return []
-    
-    def get_pending_records(self):
-        """Obtiene registros pendientes de envío"""
-        records = self.load_records()
-        return [r for r in records if not r.get('sent', False)]
     
-    def mark_as_sent(self, timestamp):
-        """Marca un registro como enviado"""
-        import json
-        
-        records = self.load_records()
-        for record in records:
-            if record.get('timestamp') == timestamp:
-                record['sent'] = True
-                break
-        
-        try:
-            with open(self.storage_file, 'w', encoding='utf-8') as f:
-                json.dump(records, f, indent=2, ensure_ascii=False)
-        except Exception:
-            pass
+    def _upload_progress(self, percent):
+        """Informa el avance de la subida de la foto"""
+        self.percent.emit(percent)
+        self.progress.emit(f"Subiendo foto... {percent}%")
@@ -2,53 +2,394 @@
 Módulo de manejo de cámara para el Sistema de Asistencia JOLG
 """
 
+import threading
+import time
+from collections import deque
+
 import cv2
 import numpy as np
 from PyQt5.QtCore import QThread, pyqtSignal
 from PyQt5.QtGui import QImage
 
+from camera_source_module import create_source
+from face_module import FaceGate
+
+
+class PreviewRenderer:
+    """
+    Prepara la vista previa en el hilo de captura
+
+    Escala el frame al tamaño del label (manteniendo la proporción) y lo
+    convierte a RGB en buffers preasignados que se reutilizan mientras no
+    cambie el tamaño. Los buffers RGB rotan para que la UI pueda seguir
+    pintando uno mientras se escribe el siguiente.
+    """
+
+    def __init__(self, buffers=3):
+        self.buffers = max(2, buffers)
+        self._target = None  # (ancho, alto) del label
+        self._lock = threading.Lock()
+        self._key = None  # (tamaño origen, tamaño destino) de los buffers
+        self._work = None  # buffer intermedio (escalado o convertido)
+        self._rgb = []
+        self._retired = deque(maxlen=2)
+        self._index = 0
+
+    def set_target_size(self, width, height):
+        """Tamaño disponible para la vista previa (llamado desde la UI)"""
+        with self._lock:
+            self._target = (width, height)
+
+    @staticmethod
+    def fit_size(width, height, target):
+        """Tamaño que entra en target manteniendo la proporción"""
+        scale = min(target[0] / width, target[1] / height)
+        return max(1, int(width * scale)), max(1, int(height * scale))
+
+    def _allocate(self, src_size, dst_size):
+        key = (src_size, dst_size)
+        if key == self._key:
+            return
+        (sw, sh), (dw, dh) = src_size, dst_size
+        # Al reducir se escala antes de convertir; al ampliar, al revés
+        work_w, work_h = (dw, dh) if dw * dh <= sw * sh else (sw, sh)
+        if self._rgb:
+            # Una imagen ya emitida puede seguir en la cola de la UI
+            self._retired.append(self._rgb)
+        self._work = np.empty((work_h, work_w, 3), dtype=np.uint8)
+        self._rgb = [np.empty((dh, dw, 3), dtype=np.uint8) for _ in range(self.buffers)]
+        self._index = 0
+        self._key = key
+
+    def render(self, frame, busy=()):
+        """
+        Convierte un frame BGR en una imagen lista para pintar
+
+        Args:
+            frame (numpy.ndarray): Frame BGR
+            busy (iterable): Índices de buffers que la UI aún puede leer
+
+        Returns:
+            tuple: (índice del buffer, QImage RGB del tamaño de la vista
+            previa que comparte memoria con ese buffer)
+        """
+        h, w = frame.shape[:2]
+        with self._lock:
+            target = self._target or (w, h)
+        dst_size = self.fit_size(w, h, target)
+        self._allocate((w, h), dst_size)
+
+        index = self._index
+        while index in busy:
+            index = (index + 1) % self.buffers
+        rgb = self._rgb[index]
+        self._index = (index + 1) % self.buffers
+        if dst_size == (w, h):
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb)
+        elif self._work.shape[:2] == rgb.shape[:2]:
+            cv2.resize(frame, dst_size, dst=self._work, interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(self._work, cv2.COLOR_BGR2RGB, dst=rgb)
+        else:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._work)
+            cv2.resize(self._work, dst_size, dst=rgb, interpolation=cv2.INTER_LINEAR)
+
+        dw, dh = dst_size
+        return index, QImage(rgb.data, dw, dh, 3 * dw, QImage.Format_RGB888)
+
+
+class FrameMailbox:
+    """
+    Entrega de frames a la UI: gana el último
+
+    Como máximo un frame está en vuelo hacia la UI. Los frames que llegan
+    mientras tanto reemplazan al pendiente (el reemplazado se cuenta como
+    descartado) en lugar de acumularse en la cola de eventos. El intervalo
+    mínimo entre pintados se adapta al tiempo de pintado medido, para que
+    pintar la vista previa no ocupe más de paint_budget del hilo de la UI.
+    El intervalo se aplica en promedio (cubeta de fichas con margen de un
+    frame), así las variaciones de la cámara alrededor del intervalo no
+    retrasan ni descartan frames. Un frame que llega antes de tiempo no se
+    pierde: la UI consulta delay() y lo pinta al vencer (el más reciente en
+    ese momento). También mide la latencia de captura a pintado.
+    """
+
+    BURST = 2.0  # fichas máximas: un frame adelantado se pinta sin esperar
+
+    def __init__(self, max_fps=30, paint_budget=0.5):
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.paint_budget = paint_budget
+        self.paint_avg = 0.0  # segundos, media móvil exponencial
+        self.delivered = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._pending = None  # (índice del buffer, QImage, instante de captura)
+        self._in_flight = None  # índice del buffer que pinta la UI
+        self._notified = False  # la UI fue avisada y aún no terminó de pintar
+        self._taken_at = None  # instante de captura del frame en pintado
+        self._latencies = deque(maxlen=300)
+        self._tokens = self.BURST
+        self._refilled_at = time.monotonic()
+
+    def interval(self):
+        """Intervalo mínimo actual entre entregas (segundos)"""
+        return max(self.min_interval, self.paint_avg / self.paint_budget)
+
+    def busy(self):
+        """Índices de buffers pendientes o en vuelo (no deben reescribirse)"""
+        with self._lock:
+            busy = set()
+            if self._pending is not None:
+                busy.add(self._pending[0])
+            if self._in_flight is not None:
+                busy.add(self._in_flight)
+            return busy
+
+    def offer(self, index, image, captured_at=None):
+        """
+        Deja un frame para la UI (desde el hilo de captura)
+
+        Args:
+            index (int): Índice del buffer de la imagen
+            image (QImage): Imagen lista para pintar
+            captured_at (float): time.monotonic() al leer el frame de la cámara
+
+        Returns:
+            bool: True si hay que avisar a la UI (no hay otro frame avisado
+            o en vuelo)
+        """
+        with self._lock:
+            if self._pending is not None:
+                self.dropped += 1
+            self._pending = (index, image, captured_at)
+            if self._notified:
+                return False
+            self._notified = True
+            return True
+
+    def _refill(self):
+        """Suma las fichas acumuladas desde la última vez (con el lock tomado)"""
+        now = time.monotonic()
+        interval = self.interval()
+        if interval:
+            self._tokens = min(self.BURST,
+                               self._tokens + (now - self._refilled_at) / interval)
+        else:
+            self._tokens = self.BURST
+        self._refilled_at = now
+        return interval
+
+    def delay(self):
+        """Segundos que la UI debe esperar antes de tomar el frame (0 si ya puede)"""
+        with self._lock:
+            interval = self._refill()
+            return 0.0 if self._tokens >= 1 else (1 - self._tokens) * interval
+
+    def take(self):
+        """Toma el frame más reciente (desde la UI); None si no hay"""
+        with self._lock:
+            if self._pending is None:
+                self._in_flight = None
+                self._notified = False
+                return None
+            index, image, self._taken_at = self._pending
+            self._pending = None
+            self._in_flight = index
+            self._refill()
+            self._tokens = max(0.0, self._tokens - 1)
+            return image
+
+    def done(self, paint_seconds):
+        """La UI terminó de pintar el frame tomado"""
+        now = time.monotonic()
+        with self._lock:
+            self._in_flight = None
+            self._notified = False
+            self.delivered += 1
+            if self._taken_at is not None:
+                self._latencies.append(now - self._taken_at)
+                self._taken_at = None
+            self.paint_avg = paint_seconds if not self.paint_avg else (
+                0.8 * self.paint_avg + 0.2 * paint_seconds)
+
+    def stats(self):
+        """
+        Returns:
+            dict: {"delivered", "dropped", "paint_ms", "max_fps",
+            "latency_p50_ms", "latency_p95_ms"} (latencias de captura a
+            pintado de los últimos frames)
+        """
+        with self._lock:
+            interval = self.interval()
+            latencies = np.array(self._latencies) * 1000 if self._latencies else np.zeros(1)
+            return {
+                "delivered": self.delivered,
+                "dropped": self.dropped,
+                "paint_ms": self.paint_avg * 1000,
+                "max_fps": 1.0 / interval if interval else 0.0,
+                "latency_p50_ms": float(np.percentile(latencies, 50)),
+                "latency_p95_ms": float(np.percentile(latencies, 95))
+            }
+
+
+class FrameRing:
+    """
+    Últimos N frames de la cámara en un arreglo NumPy preasignado
+
+    La cámara lee directamente en el siguiente hueco del anillo. Al
+    capturar se elige el frame más nítido (varianza del Laplaciano sobre
+    una copia reducida a score_width píxeles de ancho), para no guardar
+    el frame movido del instante del clic. Con score_every_frame la
+    nitidez se calcula al llegar cada frame (costo repartido); si no,
+    solo al capturar (N cálculos juntos).
+    """
+
+    def __init__(self, size=5, score_width=160, score_every_frame=False):
+        self.size = max(1, size)
+        # Un hueco extra: el que la cámara está escribiendo nunca se elige
+        self._slots = self.size + 1
+        self.score_width = score_width
+        self.score_every_frame = score_every_frame
+        self._frames = None  # (N + 1, alto, ancho, 3) uint8
+        self._scores = np.full(self._slots, np.nan, dtype=np.float32)
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def slot(self, shape=None):
+        """
+        Hueco donde escribir el próximo frame (el más antiguo)
+
+        Args:
+            shape (tuple): Forma del frame; None para usar la actual
+        Returns:
+            numpy.ndarray or None: Vista del hueco (None si aún no se conoce la forma)
+        """
+        with self._lock:
+            if shape is not None and (self._frames is None or self._frames.shape[1:] != shape):
+                self._frames = np.empty((self._slots,) + tuple(shape), dtype=np.uint8)
+                self._scores[:] = np.nan
+                self._next = 0
+                self._count = 0
+            return None if self._frames is None else self._frames[self._next]
+
+    def commit(self, frame):
+        """
+        Agrega un frame leído; si no se leyó directamente en slot(), se copia
+
+        Returns:
+            numpy.ndarray: El frame dentro del anillo
+        """
+        slot = self.slot(frame.shape)
+        if not np.shares_memory(slot, frame):
+            np.copyto(slot, frame)
+        score = self.sharpness(slot, self.score_width) if self.score_every_frame else np.nan
+        with self._lock:
+            index = self._next
+            self._scores[index] = score
+            self._next = (index + 1) % self._slots
+            self._count = min(self._count + 1, self.size)
+            return self._frames[index]
+
+    @staticmethod
+    def sharpness(frame, score_width=160):
+        """Nitidez: varianza del Laplaciano de una copia reducida en grises"""
+        h, w = frame.shape[:2]
+        if score_width and w > score_width:
+            size = (score_width, max(1, round(h * score_width / w)))
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        return float(cv2.Laplacian(gray, cv2.CV_32F).var())
+
+    def _valid_indices(self):
+        """Índices con frame, del más reciente al más antiguo (sin el hueco en escritura)"""
+        return [(self._next - 1 - i) % self._slots for i in range(self._count)]
+
+    def latest(self):
+        """Copia del frame más reciente (None si no hay)"""
+        with self._lock:
+            indices = self._valid_indices()
+            return self._frames[indices[0]].copy() if indices else None
+
+    def best(self):
+        """
+        Copia del frame más nítido del anillo (None si no hay)
+
+        Returns:
+            tuple: (frame, nitidez) o (None, 0.0)
+        """
+        with self._lock:
+            indices = self._valid_indices()
+            if not indices:
+                return None, 0.0
+            for index in indices:
+                if np.isnan(self._scores[index]):
+                    self._scores[index] = self.sharpness(self._frames[index], self.score_width)
+            best = max(indices, key=lambda i: self._scores[i])
+            return self._frames[best].copy(), float(self._scores[best])
+
 
 class CameraThread(QThread):
     """Hilo para manejar la captura de video de la cámara"""
-    changePixmap = pyqtSignal(QImage)
+    frame_ready = pyqtSignal()  # hay un frame en mailbox para pintar
     error_occurred = pyqtSignal(str)
+    face_changed = pyqtSignal(bool)  # apareció o desapareció el rostro
     
-    def __init__(self, camera_id=0):
+    def __init__(self, camera_id=0, camera_config=None, source=None):
         super().__init__()
+        camera_config = camera_config or {}
+        preview_config = camera_config.get("preview", {})
+        best_frame = camera_config.get("best_frame", {})
         self.camera_id = camera_id
-        self.camera = None
+        # Fuente de video (cámara, archivo o sintética) según camera.source
+        self.camera = source or create_source(camera_config, camera_id)
         self.running = False
+        self.frames = 0
+        self.stage_times = {"read": 0.0, "ring": 0.0, "preview": 0.0,
+                            "face": 0.0}  # segundos acumulados
         self.current_frame = None
+        self.preview = PreviewRenderer()
+        self.mailbox = FrameMailbox(preview_config.get("max_fps", 30),
+                                    preview_config.get("paint_budget", 0.5))
+        # Los frames se leen directamente en el anillo, sin copiarse
+        self.ring = FrameRing(best_frame.get("ring_size", 5),
+                              best_frame.get("score_width", 160),
+                              best_frame.get("score_every_frame", False))
+        self.face_gate = FaceGate(camera_config.get("face_gate"))
     
     def run(self):
         """Ejecuta la captura de video"""
         try:
-            self.camera = cv2.VideoCapture(self.camera_id, cv2.CAP_DSHOW)  # DirectShow para Windows más rápido
-            
-            if not self.camera.isOpened():
-                self.error_occurred.emit("No se puede acceder a la cámara")
+            if not self.camera.open():
+                self.error_occurred.emit(
+                    f"No se puede acceder a la fuente de video: {self.camera.description}")
                 return
             
-            # Configuración mínima para máxima velocidad
-            self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-            self.camera.set(cv2.CAP_PROP_FPS, 10)
-            self.camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Buffer mínimo
-            
             self.running = True
+            times = self.stage_times
             
             while self.running:
-                ret, frame = self.camera.read()
+                start = time.perf_counter()
+                ret, frame = self.camera.read(self.ring.slot())
+                captured_at = time.monotonic()
+                read_done = time.perf_counter()
                 if ret:
-                    self.current_frame = frame.copy()
-                    # Convertir frame de BGR a RGB
-                    rgb_image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    h, w, ch = rgb_image.shape
-                    bytes_per_line = ch * w
-                    
-                    # Crear QImage
-                    qt_image = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format_RGB888)
-                    self.changePixmap.emit(qt_image)
+                    frame = self.ring.commit(frame)
+                    self.current_frame = frame
+                    ring_done = time.perf_counter()
+                    # Escalado y conversión a RGB en este hilo, no en la UI
+                    index, image = self.preview.render(frame, self.mailbox.busy())
+                    if self.mailbox.offer(index, image, captured_at):
+                        self.frame_ready.emit()
+                    preview_done = time.perf_counter()
+                    # Detección de rostro después de entregar la vista previa
+                    present = self.face_gate.process(frame)
+                    if present is not None:
+                        self.face_changed.emit(present)
+                    times["read"] += read_done - start
+                    times["ring"] += ring_done - read_done
+                    times["preview"] += preview_done - ring_done
+                    times["face"] += time.perf_counter() - preview_done
+                    self.frames += 1
                 
                 else:
                     self.error_occurred.emit("Error leyendo de la cámara")
@@ -57,15 +398,25 @@ class CameraThread(QThread):
         except Exception as e:
             self.error_occurred.emit(f"Error en cámara: {str(e)}")
     
+    def set_preview_size(self, width, height):
+        """Tamaño del label donde se pinta la vista previa"""
+        self.preview.set_target_size(width, height)
+    
     def get_current_frame(self):
-        """Obtiene el frame actual"""
-        return self.current_frame.copy() if self.current_frame is not None else None
+        """Obtiene una copia del frame actual"""
+        return self.ring.latest()
+    
+    def get_best_frame(self):
+        """Obtiene una copia del frame más nítido de los últimos N"""
+        frame, _ = self.ring.best()
+        return frame
     
     def capture_photo(self, filename):
         """Captura una foto y la guarda"""
-        if self.current_frame is not None:
+        frame = self.get_best_frame()
+        if frame is not None:
             try:
-                cv2.imwrite(filename, self.current_frame)
+                cv2.imwrite(filename, frame)
                 return True
             except Exception as e:
                 self.error_occurred.emit(f"Error guardando foto: {str(e)}")
@@ -75,22 +426,24 @@ class CameraThread(QThread):
     def stop(self):
         """Detiene la captura de video"""
         self.running = False
-        if self.camera:
-            self.camera.release()
         self.quit()
         self.wait()  # Esperar a que termine el hilo
+        self.camera.release()
 
 
 class CameraManager:
     """Administrador de cámara simplificado"""
     
-    def __init__(self):
+    def __init__(self, camera_config=None):
+        self.camera_config = camera_config or {}
         self.camera_thread = None
     
-    def start_camera(self, camera_id=0):
+    def start_camera(self, camera_id=None):
         """Inicia la cámara"""
+        if camera_id is None:
+            camera_id = self.camera_config.get("device_id", 0)
         if self.camera_thread is None:
-            self.camera_thread = CameraThread(camera_id)
+            self.camera_thread = CameraThread(camera_id, self.camera_config)
         return self.camera_thread
     
     def stop_camera(self):
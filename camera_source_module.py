@@ -0,0 +1,249 @@
+"""
+Módulo de fuentes de video para el Sistema de Asistencia JOLG
+
+CameraThread lee los frames de una fuente elegida en la sección camera de
+config.json:
+
+- device: cámara física con el backend indicado (auto, dshow, msmf, v4l2)
+- file: archivo de video, opcionalmente en bucle
+- synthetic: patrón generado (no necesita cámara), para pruebas y
+  mediciones en equipos sin cámara
+
+Todas las fuentes aceptan un arreglo donde escribir el frame (read(out)),
+para que el hilo de captura pueda leer directamente en su anillo.
+"""
+
+import sys
+import time
+from abc import ABC, abstractmethod
+
+import cv2
+import numpy as np
+
+
+BACKENDS = {
+    "auto": None,
+    "any": cv2.CAP_ANY,
+    "dshow": cv2.CAP_DSHOW,
+    "msmf": cv2.CAP_MSMF,
+    "v4l2": cv2.CAP_V4L2
+}
+
+
+def default_backend():
+    """Backend de cámara según el sistema operativo"""
+    if sys.platform.startswith("win"):
+        return cv2.CAP_DSHOW  # DirectShow abre más rápido que MSMF en Windows
+    if sys.platform.startswith("linux"):
+        return cv2.CAP_V4L2
+    return cv2.CAP_ANY
+
+
+class FramePacer:
+    """Espera lo necesario para entregar frames a un ritmo fijo"""
+
+    def __init__(self, fps):
+        self.interval = 1.0 / fps if fps else 0.0
+        self._next = None
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.perf_counter()
+        if self._next is None or now - self._next > self.interval:
+            self._next = now  # Primer frame o retraso grande: no recuperar
+        elif self._next > now:
+            time.sleep(self._next - now)
+        self._next += self.interval
+
+
+class CameraSource(ABC):
+    """Interfaz común de las fuentes de video"""
+
+    description = "fuente"
+
+    @abstractmethod
+    def open(self):
+        """
+        Returns:
+            bool: True si la fuente está lista
+        """
+
+    @abstractmethod
+    def read(self, out=None):
+        """
+        Lee el siguiente frame BGR
+
+        Args:
+            out (numpy.ndarray): Arreglo donde escribirlo si tiene la forma adecuada
+
+        Returns:
+            tuple: (ret: bool, frame: numpy.ndarray)
+        """
+
+    def release(self):
+        """Libera la fuente"""
+
+
+class DeviceSource(CameraSource):
+    """Cámara física abierta con cv2.VideoCapture"""
+
+    def __init__(self, device_id=0, backend="auto", width=640, height=480, fps=30):
+        self.device_id = device_id
+        self.backend_name = backend
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.capture = None
+
+    @property
+    def description(self):
+        return f"cámara {self.device_id} ({self.backend_name})"
+
+    def open(self):
+        if self.backend_name not in BACKENDS:
+            raise ValueError(f"Backend de cámara desconocido: {self.backend_name}")
+        backend = BACKENDS[self.backend_name]
+        if backend is None:
+            backend = default_backend()
+        self.capture = cv2.VideoCapture(self.device_id, backend)
+        if not self.capture.isOpened() and self.backend_name == "auto":
+            # El backend preferido no está disponible: cualquiera
+            self.capture = cv2.VideoCapture(self.device_id)
+        if not self.capture.isOpened():
+            return False
+
+        self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        self.capture.set(cv2.CAP_PROP_FPS, self.fps)
+        self.capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Buffer mínimo
+        return True
+
+    def read(self, out=None):
+        return self.capture.read(out)
+
+    def release(self):
+        if self.capture:
+            self.capture.release()
+
+
+class VideoFileSource(CameraSource):
+    """Archivo de video reproducido al ritmo indicado (o al del archivo)"""
+
+    def __init__(self, path, loop=True, fps=None, realtime=True):
+        self.path = path
+        self.loop = loop
+        self.fps = fps
+        self.realtime = realtime
+        self.capture = None
+        self.pacer = None
+
+    @property
+    def description(self):
+        return f"archivo {self.path}"
+
+    def open(self):
+        self.capture = cv2.VideoCapture(self.path)
+        if not self.capture.isOpened():
+            return False
+        fps = self.fps or self.capture.get(cv2.CAP_PROP_FPS) or 30
+        self.pacer = FramePacer(fps if self.realtime else 0)
+        return True
+
+    def read(self, out=None):
+        self.pacer.wait()
+        ret, frame = self.capture.read(out)
+        if not ret and self.loop:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.capture.read(out)
+        return ret, frame
+
+    def release(self):
+        if self.capture:
+            self.capture.release()
+
+
+class SyntheticSource(CameraSource):
+    """
+    Patrón generado: degradado fijo con un cuadro que se desplaza
+
+    Con realtime=False entrega frames tan rápido como se pidan (para
+    medir el costo del procesamiento sin esperar a la cámara).
+    """
+
+    def __init__(self, width=640, height=480, fps=30, realtime=True, pattern="moving"):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.pattern = pattern
+        self.pacer = FramePacer(fps if realtime else 0)
+        self.frame_number = 0
+        self._background = None
+        self._noise = None
+
+    @property
+    def description(self):
+        return f"sintética {self.width}x{self.height} ({self.pattern})"
+
+    def open(self):
+        x = np.linspace(0, 255, self.width, dtype=np.float32)
+        y = np.linspace(0, 255, self.height, dtype=np.float32)
+        background = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        background[..., 0] = x[None, :]
+        background[..., 1] = y[:, None]
+        background[..., 2] = 128
+        self._background = background
+        if self.pattern == "noise":
+            rng = np.random.default_rng(0)
+            self._noise = rng.integers(0, 256, (8, self.height, self.width, 3), dtype=np.uint8)
+        return True
+
+    def read(self, out=None):
+        self.pacer.wait()
+        shape = (self.height, self.width, 3)
+        frame = out if out is not None and out.shape == shape else np.empty(shape, np.uint8)
+        n = self.frame_number
+        self.frame_number += 1
+
+        if self._noise is not None:
+            np.copyto(frame, self._noise[n % len(self._noise)])
+            return True, frame
+
+        np.copyto(frame, self._background)
+        size = self.height // 4
+        x = (n * 7) % max(1, self.width - size)
+        y = (n * 3) % max(1, self.height - size)
+        frame[y:y + size, x:x + size] = (255, 255, 255)
+        return True, frame
+
+
+def create_source(camera_config=None, device_id=None):
+    """
+    Crea la fuente de video definida en la configuración
+
+    Args:
+        camera_config (dict): Sección camera de config.json
+        device_id (int): ID de cámara (por defecto camera.device_id)
+
+    Returns:
+        CameraSource
+    """
+    camera_config = camera_config or {}
+    resolution = camera_config.get("resolution", {})
+    width = resolution.get("width", 640)
+    height = resolution.get("height", 480)
+    fps = camera_config.get("fps", 30)
+    kind = camera_config.get("source", "device")
+
+    if kind == "device":
+        if device_id is None:
+            device_id = camera_config.get("device_id", 0)
+        return DeviceSource(device_id, camera_config.get("backend", "auto"), width, height, fps)
+    if kind == "file":
+        return VideoFileSource(camera_config.get("file", ""), camera_config.get("loop", True),
+                               camera_config.get("file_fps"),
+                               camera_config.get("realtime", True))
+    if kind == "synthetic":
+        return SyntheticSource(width, height, fps, camera_config.get("realtime", True),
+                               camera_config.get("pattern", "moving"))
+    raise ValueError(f"Fuente de video desconocida: {kind}")
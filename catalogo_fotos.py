@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Catálogo del directorio de fotos: reporta fotos huérfanas (sin registro),
+registros sin foto y el espacio que ocupa cada grupo, y limpia huérfanas
+"""
+
+import argparse
+import itertools
+import sys
+
+from config_module import load_config
+from photo_module import PhotoCatalog
+from storage_module import create_storage, iter_archive
+
+
+def format_bytes(size):
+    """Formatea un tamaño en bytes de forma legible"""
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("accion", choices=["reporte", "limpiar"])
+    parser.add_argument("--completo", action="store_true",
+                        help="Volver a listar todos los directorios")
+    parser.add_argument("--dias", type=float, default=1,
+                        help="Antigüedad mínima de las huérfanas a eliminar")
+    parser.add_argument("--simular", action="store_true",
+                        help="Mostrar qué se eliminaría sin borrar nada")
+    parser.add_argument("--detalle", action="store_true",
+                        help="Listar rutas y registros afectados")
+    args = parser.parse_args()
+
+    config = load_config()
+    storage_config = config["storage"]
+    catalog = PhotoCatalog(storage_config["photos_dir"],
+                           storage_config.get("photos_catalog", "fotos_catalogo.db"))
+    stats = catalog.refresh(full=args.completo)
+    print(f"📁 Directorios listados: {stats['dirs_scanned']} · "
+          f"archivos actualizados: {stats['files_changed']} · "
+          f"eliminados: {stats['files_removed']}")
+
+    # Las fotos de registros archivados no son huérfanas
+    storage = create_storage(config)
+    records = list(itertools.chain(
+        storage.load_records(),
+        iter_archive(storage_config.get("archive_dir", "archivo"))
+    ))
+
+    if args.accion == "limpiar":
+        removed, freed = catalog.cleanup_orphans(records, args.dias, dry_run=args.simular)
+        verb = "Se eliminarían" if args.simular else "Eliminadas"
+        print(f"🧹 {verb} {removed} foto(s) huérfana(s), {format_bytes(freed)}")
+        return 0
+
+    report = catalog.reconcile(records)
+    print(f"✅ Fotos con registro: {report['referenced']['count']} "
+          f"({format_bytes(report['referenced']['bytes'])})")
+    print(f"⚠️ Fotos huérfanas: {report['orphans']['count']} "
+          f"({format_bytes(report['orphans']['bytes'])})")
+    print(f"❌ Registros sin foto: {report['missing']['count']}")
+
+    if args.detalle:
+        for path in report["orphans"]["paths"]:
+            print(f"  huérfana: {path}")
+        for rid in report["missing"]["records"]:
+            print(f"  sin foto: {rid}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
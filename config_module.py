@@ -0,0 +1,153 @@
+"""
+Módulo de configuración para el Sistema de Asistencia JOLG
+"""
+
+import copy
+import json
+import os
+
+
+DEFAULT_CONFIG = {
+    "api": {
+        "base_url": "https://backend-admin.consorciolorenzo.com",
+        "upload_endpoint": "/files/file",
+        "asistencia_endpoint": "/asistencias_jolg",
+        "timeout": 30,
+        "upload_mode": "auto",
+        "chunked_endpoint": "/files/chunked",
+        "chunk_size_kb": 64,
+        "chunk_retries": 3,
+        "chunk_state_dir": "temp/subidas",
+        "batch_endpoint": "/asistencias_jolg/batch",
+        "batch_size": 20,
+        "batch_max_kb": 256,
+        "pool_size": 4,
+        "timeouts": {
+            "default": {"connect": 5, "read": 30},
+            "upload": {"connect": 5, "read": 60},
+            "register": {"connect": 5, "read": 15},
+            "chunk": {"connect": 5, "read": 15},
+            "health": {"connect": 3, "read": 5}
+        },
+        "hedging": {
+            "enabled": False,
+            "endpoints": ["upload", "register"],
+            "percentile": 95,
+            "min_samples": 20,
+            "default_delay": 2.0,
+            "min_delay": 0.2
+        },
+        "breaker": {
+            "enabled": True,
+            "failure_threshold": 3,
+            "health_endpoint": "/",
+            "probe_interval": 5
+        }
+    },
+    "camera": {
+        "device_id": 0,
+        "source": "device",
+        "backend": "auto",
+        "file": "",
+        "loop": True,
+        "pattern": "moving",
+        "realtime": True,
+        "resolution": {
+            "width": 640,
+            "height": 480
+        },
+        "fps": 30,
+        "preview": {
+            "max_fps": 30,
+            "paint_budget": 0.5
+        },
+        "best_frame": {
+            "ring_size": 5,
+            "score_width": 160,
+            "score_every_frame": False
+        },
+        "face_gate": {
+            "enabled": False,
+            "cascade": "haarcascade_frontalface_default.xml",
+            "detect_width": 160,
+            "min_face": 0.15,
+            "hold": 1.0,
+            "cpu_budget": 0.25,
+            "min_every": 1,
+            "max_every": 15
+        }
+    },
+    "image": {
+        "enabled": True,
+        "max_width": 640,
+        "max_height": 480,
+        "quality": 85,
+        "min_quality": 40,
+        "progressive": True,
+        "grayscale": False,
+        "max_kb": 60,
+        "stats_file": "optimizacion_fotos.json",
+        "in_memory_upload": False,
+        "persist_photo": "background"
+    },
+    "speculative_upload": {
+        "enabled": False,
+        "max_age": 15,
+        "max_refreshes": 2
+    },
+    "storage": {
+        "backend": "json",
+        "local_file": "asistencia_local.json",
+        "journal_file": "asistencia_local.jsonl",
+        "sqlite_file": "asistencia_local.db",
+        "photos_dir": "fotos",
+        "photos_max_mb": 2048,
+        "photos_catalog": "fotos_catalogo.db",
+        "temp_dir": "temp",
+        "archive_dir": "archivo",
+        "retention_days": 30,
+        "compaction_interval_hours": 24,
+        "cache_max_mb": 64
+    },
+    "sync": {
+        "interval": 60,
+        "upload_concurrency": 2,
+        "register_concurrency": 2,
+        "batch_wait": 0.5,
+        "backoff_base": 5,
+        "backoff_max": 600,
+        "mark_batch_size": 20
+    }
+}
+
+
+def _merge(base, override):
+    """Combina recursivamente dos diccionarios de configuración"""
+    result = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(result.get(key), dict):
+            result[key] = _merge(result[key], value)
+        else:
+            result[key] = value
+    return result
+
+
+def load_config(config_file="config.json"):
+    """
+    Carga la configuración desde archivo, completando con valores por defecto
+
+    Args:
+        config_file (str): Ruta del archivo de configuración
+
+    Returns:
+        dict: Configuración completa
+    """
+    if not os.path.exists(config_file):
+        return copy.deepcopy(DEFAULT_CONFIG)
+
+    try:
+        with open(config_file, 'r', encoding='utf-8') as f:
+            return _merge(DEFAULT_CONFIG, json.load(f))
+    except Exception as e:
+        print(f"Error leyendo configuración: {e}")
+        return copy.deepcopy(DEFAULT_CONFIG)
@@ -0,0 +1,67 @@
+"""
+Módulo de conectividad para el Sistema de Asistencia JOLG
+
+Vigila el interruptor de circuito del transporte compartido: informa los
+cambios de estado (online / degraded / offline) y, mientras el servidor
+no responde, lo sondea en segundo plano para volver a cerrar el circuito.
+"""
+
+import threading
+import time
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from transport_module import get_transport
+
+
+class ConnectivityMonitor(QThread):
+    """Hilo que sondea el servidor mientras el circuito está abierto"""
+
+    state_changed = pyqtSignal(str)  # online, degraded u offline
+
+    def __init__(self, breaker_config=None, transport=None):
+        super().__init__()
+        breaker_config = breaker_config or {}
+        self.transport = transport or get_transport()
+        self.probe_interval = breaker_config.get("probe_interval", 5)
+        self.check_interval = breaker_config.get("check_interval", 1)
+        self.running = False
+        self._wake = threading.Event()
+
+    def state(self):
+        """Estado actual del circuito"""
+        return self.transport.breaker.state()
+
+    def run(self):
+        """Bucle de vigilancia y sondeo"""
+        self.running = True
+        last_state = None
+        last_probe = None
+        while self.running:
+            state = self.transport.breaker.state()
+            # Solo con el circuito abierto: en degraded una sonda exitosa
+            # reiniciaría la cuenta de fallos de las peticiones reales
+            if state == self.transport.breaker.OFFLINE:
+                now = time.monotonic()
+                if last_probe is None or now - last_probe >= self.probe_interval:
+                    last_probe = now
+                    self.transport.probe()
+                    state = self.transport.breaker.state()
+            else:
+                last_probe = None
+
+            if state != last_state:
+                last_state = state
+                self.state_changed.emit(state)
+
+            self._wake.wait(self.check_interval)
+            self._wake.clear()
+
+    def probe_now(self):
+        """Fuerza una comprobación inmediata"""
+        self._wake.set()
+
+    def stop(self):
+        """Detiene la vigilancia"""
+        self.running = False
+        self._wake.set()
+        self.wait()
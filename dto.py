@@ -2,10 +2,38 @@
 Data Transfer Objects (DTO) para la API de Asistencia JOLG
 """
 
+import json
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional
 
+try:
+    import orjson  # Opcional: serialización JSON más rápida
+except ImportError:
+    orjson = None
+
+
+def json_dumps(obj) -> bytes:
+    """Serializa a JSON compacto (UTF-8) con el backend más rápido disponible"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def json_loads(data):
+    """Deserializa JSON (str o bytes) con el backend más rápido disponible"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# Conversión de Personal ID (texto) al ID numérico de la API
+PERSONAL_ID_MAP = {
+    "TIENDA1": 1,
+    "TIENDA2": 2,
+    "TIENDA3": 3
+}
+
 
 @dataclass
 class AsistenciaDTO:
@@ -51,3 +79,145 @@ class AsistenciaLocalDTO:
             usuarioJolg=self.usuarioJolg,
             timestamp=self.timestamp
         )
+
+
+class AsistenciaRecord:
+    """
+    Registro canónico de asistencia para almacenamiento local
+
+    Unifica los dos esquemas presentes en asistencia_local.json:
+    - Antiguo (AsistenciaLocalDTO): usuarioJolg / foto / enviado
+    - Actual (LocalStorage.save_record): personalID / foto_path / sent
+
+    Usa __slots__ para que historiales grandes ocupen poca memoria.
+    """
+
+    __slots__ = ("id", "timestamp", "personalID", "observaciones", "foto_path", "sent",
+                 "foto_hash")
+
+    FIELDS = __slots__
+
+    def __init__(self, id, timestamp, personalID, observaciones="",
+                 foto_path=None, sent=False, foto_hash=None):
+        self.id = id
+        self.timestamp = timestamp
+        self.personalID = personalID
+        self.observaciones = observaciones
+        self.foto_path = foto_path
+        self.sent = sent
+        self.foto_hash = foto_hash  # SHA-256 de la foto en PhotoStore
+
+    def __eq__(self, other):
+        if not isinstance(other, AsistenciaRecord):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.FIELDS)
+
+    def __repr__(self):
+        fields = ", ".join(f"{f}={getattr(self, f)!r}" for f in self.FIELDS)
+        return f"AsistenciaRecord({fields})"
+
+    @classmethod
+    def from_dict(cls, data) -> "AsistenciaRecord":
+        """
+        Construye un registro desde cualquiera de los dos esquemas
+
+        Raises:
+            ValueError: Si faltan campos obligatorios, el timestamp es inválido
+                o el Personal ID no está en PERSONAL_ID_MAP
+        """
+        if not isinstance(data, dict):
+            raise ValueError("El registro no es un objeto JSON")
+
+        # Camino rápido: registro ya normalizado (esquema actual con id)
+        if ("id" in data and "sent" in data and
+                data.get("personalID") in PERSONAL_ID_MAP):
+            try:
+                return cls(data["id"], data["timestamp"], data["personalID"],
+                           data.get("observaciones") or "", data.get("foto_path"),
+                           bool(data["sent"]), data.get("foto_hash"))
+            except KeyError:
+                pass
+
+        timestamp = data.get("timestamp")
+        if not isinstance(timestamp, str):
+            raise ValueError("Registro sin timestamp")
+        datetime.fromisoformat(timestamp)  # Lanza ValueError si es inválido
+
+        personal_id = data.get("personalID", data.get("usuarioJolg"))
+        if personal_id is None or not str(personal_id).strip():
+            raise ValueError("Registro sin Personal ID")
+        personal_id = str(personal_id).strip().upper()
+        if personal_id not in PERSONAL_ID_MAP:
+            # Sin ID numérico en la API: no se envía como otra tienda
+            raise ValueError(f"Personal ID desconocido: {personal_id}")
+
+        foto_path = data.get("foto_path", data.get("foto"))
+        if foto_path:
+            # Las rutas antiguas se guardaron con separador de Windows
+            foto_path = foto_path.replace("\\", "/")
+
+        return cls(
+            id=data.get("id") or timestamp,
+            timestamp=timestamp,
+            personalID=personal_id,
+            observaciones=data.get("observaciones") or "",
+            foto_path=foto_path or None,
+            sent=bool(data.get("sent", data.get("enviado", False))),
+            foto_hash=data.get("foto_hash")
+        )
+
+    def to_dict(self):
+        """Convierte el registro al esquema actual de almacenamiento"""
+        return {
+            "id": self.id,
+            "timestamp": self.timestamp,
+            "personalID": self.personalID,
+            "observaciones": self.observaciones,
+            "foto_path": self.foto_path,
+            "sent": self.sent,
+            "foto_hash": self.foto_hash
+        }
+
+    def to_bytes(self) -> bytes:
+        """Serializa el registro como JSON compacto (una línea)"""
+        return json_dumps(self.to_dict())
+
+    @classmethod
+    def from_bytes(cls, data) -> "AsistenciaRecord":
+        """Deserializa un registro producido por to_bytes (o cualquier esquema)"""
+        return cls.from_dict(json_loads(data))
+
+    def idempotency_key(self):
+        """
+        Clave de idempotencia para las llamadas a la API
+
+        Es la misma en cada reintento del registro, así el servidor puede
+        descartar duplicados. Los IDs antiguos (timestamps) se combinan con
+        el Personal ID para no coincidir entre tiendas.
+        """
+        if self.id != self.timestamp:
+            return str(self.id)
+        return f"{self.personalID}-{self.timestamp}"
+
+    def fecha_hora(self):
+        """Fecha y hora en el formato esperado por la API"""
+        return self.timestamp[:19] + "Z"
+
+    def to_api_payload(self, foto_ruta):
+        """
+        Cuerpo JSON para POST /asistencias_jolg
+
+        Args:
+            foto_ruta (str): Ruta devuelta por la subida de la foto
+
+        Raises:
+            ValueError: Si el Personal ID no está en PERSONAL_ID_MAP
+        """
+        if self.personalID not in PERSONAL_ID_MAP:
+            raise ValueError(f"Personal ID desconocido: {self.personalID}")
+        return {
+            "personalID": PERSONAL_ID_MAP[self.personalID],
+            "observaciones": self.observaciones or "",
+            "fotoRuta": foto_ruta,
+            "fechaHoraRegistro": self.fecha_hora()
+        }
@@ -0,0 +1,211 @@
+"""
+Módulo de detección de rostro para el Sistema de Asistencia JOLG
+
+Habilita el registro solo cuando hay un rostro frente a la cámara, para no
+subir fotos del mostrador vacío o de espaldas. Usa los clasificadores en
+cascada (Haar o LBP) incluidos con OpenCV, sobre una copia reducida en
+grises, y corre en el hilo de la cámara:
+
+- Se detecta cada K frames; entre detecciones se conserva el último
+  recuadro durante hold segundos.
+- Con un rostro reciente se busca primero en una región alrededor de su
+  último recuadro (seguimiento barato) y solo si no aparece en todo el frame.
+- K se ajusta al costo medido de la detección para que no ocupe más de
+  cpu_budget del tiempo entre frames, y la vista previa mantenga su
+  frecuencia en equipos lentos.
+
+Si OpenCV no trae los clasificadores en cascada, la detección queda
+deshabilitada y el registro no se bloquea.
+"""
+
+import math
+import os
+import threading
+import time
+
+import cv2
+
+
+def cascade_path(name):
+    """Ruta del clasificador: la indicada o la del directorio de datos de OpenCV"""
+    if os.path.exists(name):
+        return name
+    data = getattr(getattr(cv2, "data", None), "haarcascades", "")
+    return os.path.join(data, name)
+
+
+class FaceDetector:
+    """Clasificador en cascada sobre una copia reducida en grises"""
+
+    def __init__(self, face_config=None):
+        face_config = face_config or {}
+        self.detect_width = face_config.get("detect_width", 160)
+        self.min_face = face_config.get("min_face", 0.15)  # fracción del ancho
+        self.scale_factor = face_config.get("scale_factor", 1.15)
+        self.min_neighbors = face_config.get("min_neighbors", 4)
+        self.classifier = None
+        self.error = None
+
+        if not hasattr(cv2, "CascadeClassifier"):
+            self.error = "esta versión de OpenCV no incluye CascadeClassifier"
+            return
+        path = cascade_path(face_config.get("cascade", "haarcascade_frontalface_default.xml"))
+        classifier = cv2.CascadeClassifier(path)
+        if classifier.empty():
+            self.error = f"no se pudo cargar {path}"
+            return
+        self.classifier = classifier
+
+    @property
+    def available(self):
+        return self.classifier is not None
+
+    def _detect_gray(self, gray):
+        min_side = max(12, int(self.detect_width * self.min_face))
+        faces = self.classifier.detectMultiScale(
+            gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors,
+            minSize=(min_side, min_side))
+        if len(faces) == 0:
+            return None
+        return max(faces, key=lambda f: f[2] * f[3])  # El rostro más grande
+
+    def detect(self, frame, near=None):
+        """
+        Busca un rostro en el frame
+
+        Args:
+            frame (numpy.ndarray): Frame BGR
+            near (tuple): Último recuadro (x, y, ancho, alto) para buscar
+                primero a su alrededor
+
+        Returns:
+            tuple or None: Recuadro (x, y, ancho, alto) en coordenadas del frame
+        """
+        h, w = frame.shape[:2]
+        scale = min(1.0, self.detect_width / w)
+        small = cv2.resize(frame, (max(1, round(w * scale)), max(1, round(h * scale))),
+                           interpolation=cv2.INTER_AREA)
+        gray = cv2.equalizeHist(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY))
+
+        if near is not None:
+            # Región del último recuadro ampliada a la mitad por cada lado
+            x, y, bw, bh = (int(v * scale) for v in near)
+            x0, y0 = max(0, x - bw // 2), max(0, y - bh // 2)
+            x1, y1 = min(gray.shape[1], x + bw + bw // 2), min(gray.shape[0], y + bh + bh // 2)
+            found = self._detect_gray(gray[y0:y1, x0:x1])
+            if found is not None:
+                fx, fy, fw, fh = found
+                return self._to_frame((fx + x0, fy + y0, fw, fh), scale)
+
+        found = self._detect_gray(gray)
+        return None if found is None else self._to_frame(found, scale)
+
+    @staticmethod
+    def _to_frame(box, scale):
+        return tuple(int(round(v / scale)) for v in box)
+
+
+class FaceGate:
+    """
+    Presencia de rostro con detección cada K frames (K adaptativo)
+
+    process() se llama desde el hilo de la cámara con cada frame;
+    present() y stats() pueden leerse desde cualquier hilo.
+    """
+
+    def __init__(self, face_config=None, detector=None):
+        face_config = face_config or {}
+        self.enabled = face_config.get("enabled", False)
+        self.hold = face_config.get("hold", 1.0)
+        self.cpu_budget = face_config.get("cpu_budget", 0.25)
+        self.min_every = max(1, face_config.get("min_every", 1))
+        self.max_every = max(self.min_every, face_config.get("max_every", 15))
+        self.detector = None
+        if self.enabled:
+            self.detector = detector or FaceDetector(face_config)
+            if not self.detector.available:
+                print(f"Detección de rostro deshabilitada: {self.detector.error}")
+                self.enabled = False
+
+        self.every = self.min_every  # K: detectar cada K frames
+        self.cost_avg = 0.0  # segundos por detección (media móvil)
+        self.frame_interval = 0.0  # segundos entre frames (media móvil)
+        self.detections = 0
+        self._countdown = 0
+        self._last_frame = None
+        self._box = None
+        self._seen_at = None
+        self._reported = False  # última presencia informada
+        self._lock = threading.Lock()
+
+    def process(self, frame):
+        """
+        Procesa un frame de la cámara
+
+        Returns:
+            bool or None: Nueva presencia si cambió en este frame, si no None
+        """
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        if self._last_frame is not None:
+            elapsed = now - self._last_frame
+            self.frame_interval = elapsed if not self.frame_interval else (
+                0.9 * self.frame_interval + 0.1 * elapsed)
+        self._last_frame = now
+
+        if self._countdown > 0:
+            self._countdown -= 1
+        else:
+            self._detect(frame, self.present(now))
+            self._countdown = self.every - 1
+
+        present = self.present()
+        if present == self._reported:
+            return None
+        self._reported = present
+        return present
+
+    def _detect(self, frame, tracking):
+        start = time.perf_counter()
+        box = self.detector.detect(frame, self._box if tracking else None)
+        cost = time.perf_counter() - start
+        with self._lock:
+            self.detections += 1
+            if box is not None:
+                self._box = box
+                self._seen_at = time.monotonic()
+            self.cost_avg = cost if not self.cost_avg else 0.8 * self.cost_avg + 0.2 * cost
+            if self.frame_interval:
+                # Costo medio por frame = cost_avg / K <= cpu_budget * intervalo
+                needed = math.ceil(self.cost_avg / (self.cpu_budget * self.frame_interval))
+                self.every = min(self.max_every, max(self.min_every, needed))
+
+    def present(self, now=None):
+        """Hay un rostro visto hace menos de hold segundos"""
+        if not self.enabled:
+            return True
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return self._seen_at is not None and now - self._seen_at <= self.hold
+
+    def box(self):
+        """Último recuadro del rostro (x, y, ancho, alto) si sigue presente"""
+        with self._lock:
+            box = self._box
+        return box if self.enabled and self.present() else None
+
+    def stats(self):
+        """
+        Returns:
+            dict: {"enabled", "present", "every", "detections", "cost_ms"}
+        """
+        with self._lock:
+            every, detections, cost = self.every, self.detections, self.cost_avg
+        return {
+            "enabled": self.enabled,
+            "present": self.present(),
+            "every": every,
+            "detections": detections,
+            "cost_ms": cost * 1000
+        }
@@ -0,0 +1,194 @@
+"""
+Módulo de optimización de fotos para el Sistema de Asistencia JOLG
+
+Reduce y recodifica las capturas antes de subirlas: dimensiones máximas,
+calidad JPEG, codificación progresiva, escala de grises opcional y un
+tamaño máximo que se alcanza buscando la mayor calidad que entra en él.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import cv2
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+class ImageOptimizer:
+    """Codifica un frame BGR como JPEG optimizado para la subida"""
+
+    # Calidad por defecto de cv2.imwrite (referencia de "bytes antes")
+    BASELINE_QUALITY = 95
+
+    def __init__(self, image_config=None):
+        image_config = image_config or {}
+        self.enabled = image_config.get("enabled", True)
+        self.max_width = image_config.get("max_width", 640)
+        self.max_height = image_config.get("max_height", 480)
+        self.quality = image_config.get("quality", 85)
+        self.min_quality = image_config.get("min_quality", 40)
+        self.progressive = image_config.get("progressive", True)
+        self.grayscale = image_config.get("grayscale", False)
+        self.max_bytes = image_config.get("max_kb", 0) * 1024
+        self.stats = OptimizationStats(image_config.get("stats_file", "optimizacion_fotos.json"))
+
+    def _resize(self, frame):
+        """Reduce el frame para que entre en las dimensiones máximas"""
+        h, w = frame.shape[:2]
+        scale = min(1.0, self.max_width / w, self.max_height / h)
+        if scale >= 1.0:
+            return frame
+        size = (max(1, round(w * scale)), max(1, round(h * scale)))
+        return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+    def _encode(self, frame, quality):
+        params = [
+            cv2.IMWRITE_JPEG_QUALITY, quality,
+            cv2.IMWRITE_JPEG_OPTIMIZE, 1,
+            cv2.IMWRITE_JPEG_PROGRESSIVE, 1 if self.progressive else 0
+        ]
+        ok, buffer = cv2.imencode(".jpg", frame, params)
+        if not ok:
+            raise ValueError("No se pudo codificar la foto")
+        return buffer.tobytes()
+
+    def optimize(self, frame):
+        """
+        Codifica un frame con la configuración de optimización
+
+        Args:
+            frame (numpy.ndarray): Imagen BGR de la cámara
+
+        Returns:
+            tuple: (bytes JPEG, dict con "bytes_before", "bytes_after",
+                    "width", "height", "quality")
+        """
+        ok, baseline = cv2.imencode(".jpg", frame)
+        if not ok:
+            raise ValueError("No se pudo codificar la foto")
+        bytes_before = len(baseline)
+
+        if not self.enabled:
+            data, quality = baseline.tobytes(), self.BASELINE_QUALITY
+            image = frame
+        else:
+            image = self._resize(frame)
+            if self.grayscale:
+                image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+            quality = self.quality
+            data = self._encode(image, quality)
+            if self.max_bytes and len(data) > self.max_bytes:
+                # Búsqueda binaria de la mayor calidad que entra en el límite
+                low, high = self.min_quality, self.quality - 1
+                best = None
+                while low <= high:
+                    mid = (low + high) // 2
+                    candidate = self._encode(image, mid)
+                    if len(candidate) <= self.max_bytes:
+                        best, quality = candidate, mid
+                        low = mid + 1
+                    else:
+                        high = mid - 1
+                if best is None:
+                    # Ni la calidad mínima entra: se usa la calidad mínima
+                    quality = self.min_quality
+                    best = self._encode(image, quality)
+                data = best
+
+        h, w = image.shape[:2]
+        info = {
+            "bytes_before": bytes_before,
+            "bytes_after": len(data),
+            "width": w,
+            "height": h,
+            "quality": quality
+        }
+        self.stats.add(bytes_before, len(data))
+        return data, info
+
+
+class OptimizationStats:
+    """Totales acumulados de bytes antes y después de optimizar (en disco)"""
+
+    def __init__(self, stats_file):
+        self.stats_file = stats_file
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        Returns:
+            dict: {"count", "bytes_before", "bytes_after"}
+        """
+        try:
+            with open(self.stats_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"count": 0, "bytes_before": 0, "bytes_after": 0}
+
+    def add(self, bytes_before, bytes_after):
+        """Suma una foto a los totales"""
+        if not self.stats_file:
+            return
+        with self._lock:
+            totals = self.load()
+            totals["count"] += 1
+            totals["bytes_before"] += bytes_before
+            totals["bytes_after"] += bytes_after
+            directory = os.path.dirname(os.path.abspath(self.stats_file))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(totals, f)
+            os.replace(tmp_path, self.stats_file)
+
+
+class PhotoPrepWorker(QThread):
+    """
+    Optimiza una captura y la guarda en el almacén sin bloquear la UI
+
+    Con persist=False no escribe en disco: emite encoded con los bytes JPEG
+    para subirlos desde memoria, y la copia local se guarda después con
+    PhotoSaveWorker.
+    """
+
+    ready = pyqtSignal(str, dict)  # hash de la foto, datos de optimización
+    encoded = pyqtSignal(str, bytes, dict)  # hash, bytes JPEG, datos de optimización
+    failed = pyqtSignal(str)
+
+    def __init__(self, frame, optimizer, photo_store, persist=True):
+        super().__init__()
+        self.frame = frame
+        self.optimizer = optimizer
+        self.photo_store = photo_store
+        self.persist = persist
+
+    def run(self):
+        try:
+            data, info = self.optimizer.optimize(self.frame)
+            if self.persist:
+                foto_hash = self.photo_store.put_bytes(data)
+                self.ready.emit(foto_hash, info)
+            else:
+                self.encoded.emit(hashlib.sha256(data).hexdigest(), data, info)
+        except Exception as e:
+            self.failed.emit(f"Error procesando foto: {str(e)}")
+
+
+class PhotoSaveWorker(QThread):
+    """Guarda en el almacén una foto ya codificada, fuera del hilo de la UI"""
+
+    saved = pyqtSignal(str)  # hash de la foto
+    failed = pyqtSignal(str)
+
+    def __init__(self, data, photo_store):
+        super().__init__()
+        self.data = data
+        self.photo_store = photo_store
+
+    def run(self):
+        try:
+            self.saved.emit(self.photo_store.put_bytes(self.data))
+        except Exception as e:
+            self.failed.emit(f"Error guardando foto: {str(e)}")
@@ -6,14 +6,24 @@ Versión modularizada y optimizada
 
 import sys
 import os
-from datetime import datetime
+import time
 from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QTimer
 from PyQt5.QtGui import QPixmap
 
 # Importar módulos locales
 from ui_module import AsistenciaUI
 from camera_module import CameraManager
-from api_module import AsistenciaWorker, LocalStorage
+from api_module import AsistenciaWorker
+from config_module import load_config
+from storage_module import create_storage, record_id
+from dto import AsistenciaRecord
+from sync_module import SyncWorker, CompactionWorker
+from connectivity_module import ConnectivityMonitor
+from transport_module import get_transport
+from photo_module import PhotoStore
+from image_module import ImageOptimizer, PhotoPrepWorker, PhotoSaveWorker
+from speculative_module import SpeculativeUploader
 
 
 class AsistenciaApp:
@@ -21,13 +31,38 @@ class AsistenciaApp:
     
     def __init__(self):
         self.ui = AsistenciaUI()
-        self.camera_manager = CameraManager()
-        self.local_storage = LocalStorage()
+        self.config = load_config()
+        self.camera_manager = CameraManager(self.config.get("camera"))
+        self.local_storage = create_storage(self.config)
+        storage_config = self.config["storage"]
+        self.photo_store = PhotoStore(
+            storage_config["photos_dir"],
+            int(storage_config.get("photos_max_mb", 2048) * 1024 * 1024)
+        )
+        self.image_optimizer = ImageOptimizer(self.config.get("image"))
+        image_config = self.config.get("image", {})
+        self.in_memory_upload = image_config.get("in_memory_upload", False)
+        self.persist_photo = image_config.get("persist_photo", "background")
+        self.prep_worker = None
+        self.save_workers = []
+        self.current_foto_data = None
+        self.speculative = SpeculativeUploader(self.image_optimizer, self.photo_store,
+                                               self.config.get("speculative_upload"))
+        self.waiting_speculative = False
+        self.pending_registro = None
         self.current_worker = None
+        self.current_record = None
+        self.sync_worker = None
+        self.compaction_worker = None
+        self.connectivity_monitor = None
         
         self.setup_connections()
         self.setup_camera()
         self.create_directories()
+        self.setup_sync()
+        self.setup_connectivity()
+        self.setup_compaction()
+        self.setup_speculative()
     
     def create_directories(self):
         """Crea directorios necesarios"""
@@ -42,24 +77,126 @@ class AsistenciaApp:
         """Configura e inicia la cámara"""
         try:
             camera_thread = self.camera_manager.start_camera()
-            camera_thread.changePixmap.connect(self.update_camera_image)
+            camera_thread.frame_ready.connect(self.update_camera_image)
             camera_thread.error_occurred.connect(self.handle_camera_error)
+            if camera_thread.face_gate.enabled:
+                # Registrar solo con un rostro frente a la cámara
+                self.ui.set_face_present(False)
+                camera_thread.face_changed.connect(self.ui.set_face_present)
             camera_thread.start()
             
         except Exception as e:
             self.ui.update_status(f"Error iniciando cámara: {str(e)}", "error")
     
-    def update_camera_image(self, qt_image):
-        """Actualiza la imagen de la cámara en la UI"""
+    def setup_sync(self):
+        """Inicia la sincronización en segundo plano de registros pendientes"""
+        self.sync_worker = SyncWorker(self.local_storage, self.config.get("sync"),
+                                      photo_store=self.photo_store)
+        self.sync_worker.backlog_changed.connect(self.ui.update_backlog)
+        self.sync_worker.replay_progress.connect(self.ui.update_sync_progress)
+        self.sync_worker.start()
+    
+    def setup_connectivity(self):
+        """Inicia la vigilancia del servidor (interruptor de circuito y sonda)"""
+        self.connectivity_monitor = ConnectivityMonitor(self.config["api"].get("breaker"))
+        self.connectivity_monitor.state_changed.connect(self.ui.update_connection)
+        self.connectivity_monitor.state_changed.connect(self.handle_connection_changed)
+        self.connectivity_monitor.start()
+    
+    def handle_connection_changed(self, state):
+        """Reenvía los pendientes en cuanto vuelve la conexión"""
+        if state == "online" and self.sync_worker:
+            self.sync_worker.sync_now()
+    
+    def setup_speculative(self):
+        """Sube una foto candidata al elegir el Personal ID (si está habilitado)"""
+        if not self.speculative.enabled:
+            return
+        self.ui.personal_id_combo.currentIndexChanged.connect(self.handle_personal_changed)
+        self.speculative.ready.connect(self.handle_speculative_ready)
+        self.speculative_timer = QTimer()
+        self.speculative_timer.timeout.connect(self.refresh_speculative)
+        self.speculative_timer.start(1000)
+    
+    def can_speculate(self):
+        """No se sube por adelantado sin conexión ni durante un registro"""
+        return (self.ui.btn_registrar.isEnabled() and
+                not get_transport().breaker.is_open() and
+                self.camera_manager.camera_thread is not None and
+                self.camera_manager.camera_thread.current_frame is not None)
+    
+    def handle_personal_changed(self, index):
+        """Descarta la foto candidata anterior y sube una para el nuevo Personal ID"""
+        self.speculative.discard()
+        if self.waiting_speculative:
+            # El registro en curso esperaba la foto descartada: se captura otra
+            self.waiting_speculative = False
+            self.capture_and_register()
+            return
+        personal_id = self.ui.get_personal_id()
+        if personal_id and self.can_speculate():
+            self.speculative.start(personal_id,
+                                   self.camera_manager.camera_thread.get_best_frame())
+    
+    def refresh_speculative(self):
+        """Recaptura la foto candidata vencida mientras siga elegido el mismo ID"""
+        personal_id = self.ui.get_personal_id()
+        if personal_id and self.speculative.needs_refresh(personal_id) and self.can_speculate():
+            self.speculative.start(personal_id,
+                                   self.camera_manager.camera_thread.get_best_frame(),
+                                   refresh=True)
+    
+    def handle_speculative_ready(self):
+        """Continúa un registro que esperaba la subida anticipada"""
+        if not self.waiting_speculative:
+            return
+        self.waiting_speculative = False
+        personal_id, _ = self.pending_registro
+        photo = self.speculative.take(personal_id)
+        if photo:
+            self.handle_foto_codificada(photo.foto_hash, photo.data, photo.info,
+                                        photo.foto_ruta)
+        else:
+            self.capture_and_register()
+    
+    def setup_compaction(self):
+        """Programa la compactación del historial local (al inicio y periódica)"""
+        hours = self.config["storage"].get("compaction_interval_hours", 24)
+        self.compaction_timer = QTimer()
+        self.compaction_timer.timeout.connect(self.run_compaction)
+        self.compaction_timer.start(int(hours * 3600 * 1000))
+        self.run_compaction()
+    
+    def run_compaction(self):
+        """Lanza una pasada de compactación si no hay otra en curso"""
+        if self.compaction_worker and self.compaction_worker.isRunning():
+            return
+        self.compaction_worker = CompactionWorker(self.local_storage, self.config["storage"],
+                                                  photo_store=self.photo_store)
+        self.compaction_worker.start()
+    
+    def update_camera_image(self):
+        """Pinta el frame más reciente de la cámara (uno en vuelo a la vez)"""
+        camera_thread = self.camera_manager.camera_thread
+        if not camera_thread:
+            return
+        delay = camera_thread.mailbox.delay()
+        if delay > 0:
+            # Frame adelantado al intervalo mínimo: se pinta al vencer
+            QTimer.singleShot(int(delay * 1000) + 1, self.update_camera_image)
+            return
+        start = time.perf_counter()
+        qt_image = camera_thread.mailbox.take()
+        if qt_image is None:
+            return
         try:
-            pixmap = QPixmap.fromImage(qt_image)
+            # La imagen ya llega escalada y en RGB desde el hilo de la cámara
             camera_label = self.ui.get_camera_label()
-            scaled_pixmap = pixmap.scaled(
-                camera_label.size(),
-                aspectRatioMode=1,
-                transformMode=1  # Smooth transformation
-            )
-            camera_label.setPixmap(scaled_pixmap)
+            camera_label.setPixmap(QPixmap.fromImage(qt_image))
+            camera_label.repaint()  # Pintar ya, para medir el costo real
+            
+            size = camera_label.size()
+            camera_thread.set_preview_size(size.width(), size.height())
             
             # Solo mostrar esto una vez
             if not hasattr(self, '_camera_started'):
@@ -68,6 +205,8 @@ class AsistenciaApp:
                 
         except Exception as e:
             print(f"Error actualizando imagen: {e}")
+        finally:
+            camera_thread.mailbox.done(time.perf_counter() - start)
     
     def handle_camera_error(self, error_message):
         """Maneja errores de la cámara"""
@@ -89,56 +228,179 @@ class AsistenciaApp:
             self.ui.show_message("Error", "No hay imagen de cámara disponible", "error")
             return
         
+        if not self.camera_manager.camera_thread.face_gate.present():
+            self.ui.update_status("Colóquese frente a la cámara para registrar", "warning")
+            return
+        
         # Deshabilitar botón durante el proceso
         self.ui.set_register_enabled(False)
         self.ui.show_progress("Iniciando registro...")
+        self.pending_registro = (personal_id, observaciones)
         
+        # Foto subida por adelantado: solo falta registrar la asistencia
+        photo = self.speculative.take(personal_id)
+        if photo:
+            self.handle_foto_codificada(photo.foto_hash, photo.data, photo.info, photo.foto_ruta)
+            return
+        if self.speculative.is_pending(personal_id):
+            self.waiting_speculative = True
+            self.ui.update_status("Terminando de subir la foto...", "info")
+            return
+        self.speculative.discard()
+        self.capture_and_register()
+    
+    def capture_and_register(self):
+        """Captura el frame actual y lo procesa para el registro pendiente"""
         try:
-            # Capturar foto
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            foto_filename = f"asistencia_{personal_id}_{timestamp}.jpg"
-            foto_path = os.path.join("fotos", foto_filename)
+            # Capturar foto (el frame más nítido de los últimos N)
+            frame = self.camera_manager.camera_thread.get_best_frame()
+            if frame is None:
+                self.handle_foto_error("No se pudo capturar la foto")
+                return
             
-            # Guardar foto
-            if self.camera_manager.capture_photo(foto_path):
-                self.ui.update_status("Foto capturada, enviando...", "info")
-                
-                # Guardar localmente primero
-                self.local_storage.save_record(
-                    personal_id,  # Ahora es texto, no número
-                    observaciones, 
-                    foto_path, 
-                    sent=False
-                )
-                
-                # Iniciar proceso de envío en segundo plano
-                self.current_worker = AsistenciaWorker(
-                    personal_id,  # Enviar como texto
-                    observaciones,
-                    foto_path
-                )
-                
-                self.current_worker.progress.connect(self.ui.update_status)
-                self.current_worker.finished.connect(self.handle_registro_finished)
-                self.current_worker.start()
-                
-            else:
-                self.ui.hide_progress()
-                self.ui.set_register_enabled(True)
-                self.ui.update_status("Error capturando foto", "error")
-                self.ui.show_message("Error", "No se pudo capturar la foto", "error")
+            # Optimizar y guardar en el almacén fuera del hilo de la UI
+            self.ui.update_status("Procesando foto...", "info")
+            self.prep_worker = PhotoPrepWorker(frame, self.image_optimizer, self.photo_store,
+                                               persist=not self.in_memory_upload)
+            self.prep_worker.ready.connect(self.handle_foto_lista)
+            self.prep_worker.encoded.connect(self.handle_foto_codificada)
+            self.prep_worker.failed.connect(self.handle_foto_error)
+            self.prep_worker.start()
                 
         except Exception as e:
+            self.pending_registro = None
             self.ui.hide_progress()
             self.ui.set_register_enabled(True)
             self.ui.update_status(f"Error inesperado: {str(e)}", "error")
             self.ui.show_message("Error", f"Error inesperado: {str(e)}", "error")
     
+    def handle_foto_lista(self, foto_hash, info):
+        """Guarda el registro con la foto optimizada e inicia el envío"""
+        self.start_registro(foto_hash, info)
+    
+    def handle_foto_codificada(self, foto_hash, data, info, foto_ruta=None):
+        """
+        Inicia el envío subiendo la foto desde memoria
+        
+        La copia local se escribe en segundo plano una vez iniciada la
+        subida ("background"), o solo si el envío falla ("on_failure").
+        Con foto_ruta (subida anticipada) solo se registra la asistencia.
+        """
+        if not self.start_registro(foto_hash, info, data, foto_ruta):
+            return
+        if self.persist_photo == "on_failure":
+            self.current_foto_data = data
+        else:
+            self.save_photo(data)
+    
+    def save_photo(self, data):
+        """Guarda una foto codificada en el almacén sin bloquear la UI"""
+        worker = PhotoSaveWorker(data, self.photo_store)
+        worker.failed.connect(lambda message: self.ui.update_status(message, "error"))
+        worker.finished.connect(lambda: self.save_workers.remove(worker))
+        self.save_workers.append(worker)
+        worker.start()
+    
+    def start_registro(self, foto_hash, info, foto_data=None, foto_ruta=None):
+        """
+        Guarda el registro local e inicia el envío al servidor
+        
+        Returns:
+            bool: True si el envío quedó en curso
+        """
+        personal_id, observaciones = self.pending_registro
+        self.pending_registro = None
+        foto_path = self.photo_store.path_for(foto_hash)
+        self.ui.update_status("Foto capturada, enviando...", "info")
+        
+        try:
+            # Guardar localmente primero
+            self.current_record = self.local_storage.save_record(
+                personal_id,  # Ahora es texto, no número
+                observaciones, 
+                foto_path, 
+                sent=False,
+                foto_hash=foto_hash
+            )
+            
+            if get_transport().breaker.is_open():
+                # Sin conexión: solo respaldo local, la sincronización lo enviará
+                self.finish_offline(foto_data)
+                return False
+            
+            # Evitar que la sincronización lo reenvíe mientras está en curso
+            if self.current_record and self.sync_worker:
+                self.sync_worker.hold(record_id(self.current_record))
+            
+            # El mismo registro local nunca crea dos asistencias en el servidor
+            idempotency_key = None
+            if self.current_record:
+                idempotency_key = AsistenciaRecord.from_dict(self.current_record).idempotency_key()
+            
+            # Iniciar proceso de envío en segundo plano
+            self.current_worker = AsistenciaWorker(
+                personal_id,  # Enviar como texto
+                observaciones,
+                foto_path,
+                foto_data,
+                idempotency_key,
+                foto_ruta
+            )
+            
+            self.current_worker.progress.connect(self.ui.update_status)
+            self.current_worker.percent.connect(self.ui.update_upload_progress)
+            self.current_worker.finished.connect(self.handle_registro_finished)
+            self.current_worker.start()
+            return True
+            
+        except Exception as e:
+            self.handle_foto_error(f"Error inesperado: {str(e)}")
+            return False
+    
+    def finish_offline(self, foto_data=None):
+        """Termina un registro guardado solo localmente (circuito abierto)"""
+        if foto_data is not None:
+            self.save_photo(foto_data)
+        self.current_record = None
+        self.ui.hide_progress()
+        self.ui.set_register_enabled(True)
+        self.ui.update_status("💾 Sin conexión: asistencia guardada localmente", "warning")
+        self.ui.clear_inputs()
+        if self.sync_worker:
+            self.sync_worker.sync_now()  # Actualiza el contador de pendientes
+    
+    def handle_foto_error(self, message):
+        """Maneja un fallo al capturar o procesar la foto"""
+        self.pending_registro = None
+        self.ui.hide_progress()
+        self.ui.set_register_enabled(True)
+        self.ui.update_status("Error capturando foto", "error")
+        self.ui.show_message("Error", message, "error")
+    
     def handle_registro_finished(self, success, message):
         """Maneja el resultado del registro de asistencia"""
         self.ui.hide_progress()
         self.ui.set_register_enabled(True)
         
+        if self.current_foto_data is not None:
+            # Subida desde memoria fallida: la foto se guarda para reenviarla
+            if not success:
+                self.save_photo(self.current_foto_data)
+            self.current_foto_data = None
+        # Se descarta la foto candidata; el uploader (y su señal ready) se conserva
+        self.speculative.discard()
+        self.waiting_speculative = False
+        
+        if self.current_record:
+            rid = record_id(self.current_record)
+            if success:
+                self.local_storage.mark_many_as_sent([rid])
+            if self.sync_worker:
+                self.sync_worker.release(rid)
+                if success:
+                    self.sync_worker.sync_now()
+            self.current_record = None
+        
         if success:
             self.ui.update_status("✅ Asistencia registrada exitosamente", "success")
             self.ui.show_message("Éxito", message, "information")
@@ -158,10 +420,35 @@ class AsistenciaApp:
     
     def close(self):
         """Cierra la aplicación y limpia recursos"""
+        if self.prep_worker:
+            self.prep_worker.wait()
+        
+        self.speculative.wait()
+        
         if self.current_worker:
             self.current_worker.quit()
             self.current_worker.wait()
         
+        if self.current_foto_data is not None:
+            # Cierre con un envío en curso: conservar la foto para reenviarla
+            self.photo_store.put_bytes(self.current_foto_data)
+            self.current_foto_data = None
+        
+        for worker in list(self.save_workers):
+            worker.wait()
+        
+        if self.sync_worker:
+            self.sync_worker.stop()
+        
+        if self.connectivity_monitor:
+            self.connectivity_monitor.stop()
+        
+        self.compaction_timer.stop()
+        if self.speculative.enabled:
+            self.speculative_timer.stop()
+        if self.compaction_worker:
+            self.compaction_worker.wait()
+        
         self.camera_manager.stop_camera()
         self.ui.close()
 
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Migra un respaldo local (asistencia_local.json, cualquier esquema) al
+almacenamiento configurado, leyendo el archivo por partes
+"""
+
+import argparse
+import sys
+
+from config_module import load_config
+from storage_module import create_storage, migrate_file
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("origen", help="Archivo JSON con un arreglo de registros")
+    parser.add_argument("--backend", choices=["json", "journal", "sqlite"],
+                        help="Backend destino (por defecto, el de config.json)")
+    parser.add_argument("--destino", help="Archivo destino (por defecto, el de config.json)")
+    parser.add_argument("--lote", type=int, default=1000, help="Registros por escritura")
+    args = parser.parse_args()
+
+    config = load_config()
+    storage_config = config["storage"]
+    # El origen se migra explícitamente; no reimportarlo como archivo antiguo
+    storage_config["local_file"] = ""
+    if args.backend:
+        storage_config["backend"] = args.backend
+    if args.destino:
+        key = {"json": "local_file", "journal": "journal_file",
+               "sqlite": "sqlite_file"}[storage_config["backend"]]
+        storage_config[key] = args.destino
+    elif storage_config["backend"] == "json":
+        parser.error("El backend json requiere --destino")
+
+    storage = create_storage(config)
+    try:
+        report = migrate_file(args.origen, storage, args.lote)
+    except (OSError, ValueError) as e:
+        print(f"❌ Error migrando {args.origen}: {e}")
+        return 1
+
+    print(f"✅ Migrados: {report['migrated']}")
+    print(f"↩️  Duplicados omitidos: {report['duplicates']}")
+    print(f"❌ Rechazados: {report['rejected']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,370 @@
+"""
+Módulo de almacenamiento de fotos para el Sistema de Asistencia JOLG
+
+Las fotos se guardan por contenido (SHA-256): bytes idénticos ocupan un
+solo archivo. El directorio tiene un presupuesto de bytes; al superarlo se
+eliminan primero las fotos más antiguas cuyos registros ya fueron enviados.
+"""
+
+import hashlib
+import os
+import posixpath
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+
+class PhotoStore:
+    """Almacén de fotos direccionado por contenido y con tamaño acotado"""
+
+    def __init__(self, photos_dir="fotos", max_bytes=2 * 1024 ** 3):
+        self.photos_dir = photos_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(photos_dir, exist_ok=True)
+
+    @staticmethod
+    def is_hash(name):
+        """Indica si un nombre es un hash SHA-256 en hexadecimal"""
+        return len(name) == 64 and all(c in "0123456789abcdef" for c in name)
+
+    def path_for(self, photo_hash):
+        """Ruta del archivo para un hash (repartido en subdirectorios de 2 caracteres)"""
+        return os.path.join(self.photos_dir, photo_hash[:2], f"{photo_hash}.jpg").replace("\\", "/")
+
+    def contains(self, photo_hash):
+        """Indica si la foto está en el almacén"""
+        return os.path.exists(self.path_for(photo_hash))
+
+    def put_bytes(self, data):
+        """
+        Guarda una foto a partir de sus bytes
+
+        Returns:
+            str: Hash SHA-256 de la foto
+        """
+        photo_hash = hashlib.sha256(data).hexdigest()
+        path = self.path_for(photo_hash)
+        if os.path.exists(path):
+            os.utime(path)  # Deduplicada: renovar su antigüedad
+            return photo_hash
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return photo_hash
+
+    def put_file(self, file_path, move=True):
+        """
+        Guarda una foto existente en disco
+
+        Args:
+            file_path (str): Ruta de la foto
+            move (bool): Eliminar el archivo original tras guardarlo
+
+        Returns:
+            str: Hash SHA-256 de la foto
+        """
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        photo_hash = digest.hexdigest()
+
+        path = self.path_for(photo_hash)
+        if os.path.exists(path):
+            os.utime(path)
+            if move:
+                os.remove(file_path)
+            return photo_hash
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if move:
+            shutil.move(file_path, path)
+        else:
+            shutil.copyfile(file_path, path)
+        return photo_hash
+
+    def iter_photos(self):
+        """
+        Recorre las fotos del almacén
+
+        Yields:
+            tuple: (hash, ruta, tamaño en bytes, mtime)
+        """
+        if not os.path.isdir(self.photos_dir):
+            return
+        for shard in os.scandir(self.photos_dir):
+            if not shard.is_dir() or len(shard.name) != 2:
+                continue
+            for entry in os.scandir(shard.path):
+                name, ext = os.path.splitext(entry.name)
+                if ext != ".jpg" or not self.is_hash(name):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                yield name, entry.path, st.st_size, st.st_mtime
+
+    def total_bytes(self):
+        """Bytes ocupados por las fotos del almacén"""
+        return sum(size for _, _, size, _ in self.iter_photos())
+
+    def enforce_budget(self, local_storage):
+        """
+        Elimina fotos antiguas hasta quedar dentro del presupuesto de bytes
+
+        Nunca elimina la foto de un registro pendiente de envío. Las demás
+        (registros enviados o ya archivados) se eliminan de la más antigua
+        a la más reciente.
+
+        Returns:
+            tuple: (fotos eliminadas, bytes liberados)
+        """
+        with self._lock:
+            photos = list(self.iter_photos())
+            total = sum(size for _, _, size, _ in photos)
+            if total <= self.max_bytes:
+                return 0, 0
+
+            # Se consulta después de listar: una foto nueva que aparezca
+            # entre ambos pasos no está en la lista y no puede borrarse
+            protected = {
+                r.get("foto_hash") for r in local_storage.get_pending_records()
+            }
+
+            evicted = 0
+            freed = 0
+            for photo_hash, path, size, _ in sorted(photos, key=lambda p: p[3]):
+                if total - freed <= self.max_bytes:
+                    break
+                if photo_hash in protected:
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                evicted += 1
+                freed += size
+
+            return evicted, freed
+
+
+def normalize_photo_path(path):
+    """Normaliza una ruta de foto (acepta separadores de Windows) a formato POSIX"""
+    return posixpath.normpath(path.replace("\\", "/"))
+
+
+class PhotoCatalog:
+    """
+    Catálogo indexado del directorio de fotos
+
+    Se guarda en SQLite y se actualiza de forma incremental: un directorio
+    solo se vuelve a listar si cambió su mtime (se agregaron o quitaron
+    archivos), y dentro de él solo se actualizan los archivos cuyo tamaño
+    o mtime cambiaron. No se calcula ningún hash: las fotos se relacionan
+    con los registros por ruta normalizada o por el hash de su nombre.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS dirs (
+            path TEXT PRIMARY KEY,
+            parent TEXT,
+            mtime_ns INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS idx_dirs_parent ON dirs (parent);
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            dir TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_files_dir ON files (dir);
+    """
+
+    def __init__(self, photos_dir="fotos", catalog_file="fotos_catalogo.db"):
+        self.photos_dir = normalize_photo_path(photos_dir)
+        self._conn = sqlite3.connect(catalog_file)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self.SCHEMA)
+        self._conn.commit()
+
+    def refresh(self, full=False):
+        """
+        Actualiza el catálogo con los cambios del directorio de fotos
+
+        Args:
+            full (bool): Volver a listar todos los directorios aunque su
+                mtime no haya cambiado (detecta archivos modificados en sitio)
+
+        Returns:
+            dict: {"dirs_scanned", "files_changed", "files_removed"}
+        """
+        stats = {"dirs_scanned": 0, "files_changed": 0, "files_removed": 0}
+        known_dirs = dict(self._conn.execute("SELECT path, mtime_ns FROM dirs"))
+        seen_dirs = set()
+
+        with self._conn:
+            pending = [(self.photos_dir, None)]
+            while pending:
+                dir_path, parent = pending.pop()
+                try:
+                    mtime_ns = os.stat(dir_path).st_mtime_ns
+                except OSError:
+                    continue
+                seen_dirs.add(dir_path)
+
+                if not full and known_dirs.get(dir_path) == mtime_ns:
+                    # Sin cambios: reutilizar la lista de subdirectorios conocida
+                    for (child,) in self._conn.execute(
+                            "SELECT path FROM dirs WHERE parent = ?", (dir_path,)):
+                        pending.append((child, dir_path))
+                    continue
+
+                stats["dirs_scanned"] += 1
+                changed, removed, subdirs = self._scan_dir(dir_path)
+                stats["files_changed"] += changed
+                stats["files_removed"] += removed
+                pending.extend((child, dir_path) for child in subdirs)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO dirs (path, parent, mtime_ns) VALUES (?, ?, ?)",
+                    (dir_path, parent, mtime_ns)
+                )
+
+            # Directorios que ya no existen
+            for dir_path in set(known_dirs) - seen_dirs:
+                cursor = self._conn.execute("DELETE FROM files WHERE dir = ?", (dir_path,))
+                stats["files_removed"] += cursor.rowcount
+                self._conn.execute("DELETE FROM dirs WHERE path = ?", (dir_path,))
+
+        return stats
+
+    def _scan_dir(self, dir_path):
+        """Lista un directorio y sincroniza sus archivos con el catálogo"""
+        known = {
+            path: (size, mtime_ns) for path, size, mtime_ns in self._conn.execute(
+                "SELECT path, size, mtime_ns FROM files WHERE dir = ?", (dir_path,))
+        }
+        changed = 0
+        subdirs = []
+        present = set()
+        for entry in os.scandir(dir_path):
+            path = normalize_photo_path(entry.path)
+            if entry.is_dir():
+                subdirs.append(path)
+                continue
+            if not entry.name.lower().endswith((".jpg", ".jpeg")):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            present.add(path)
+            if known.get(path) != (st.st_size, st.st_mtime_ns):
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO files (path, dir, size, mtime_ns) VALUES (?, ?, ?, ?)",
+                    (path, dir_path, st.st_size, st.st_mtime_ns)
+                )
+                changed += 1
+
+        gone = [(path,) for path in known if path not in present]
+        self._conn.executemany("DELETE FROM files WHERE path = ?", gone)
+        return changed, len(gone), subdirs
+
+    def _record_photo_path(self, record):
+        """Ruta normalizada de la foto de un registro (por hash o por ruta)"""
+        photo_hash = record.get("foto_hash")
+        if photo_hash:
+            return posixpath.join(self.photos_dir, photo_hash[:2], f"{photo_hash}.jpg")
+        foto_path = record.get("foto_path", record.get("foto"))
+        return normalize_photo_path(foto_path) if foto_path else None
+
+    def reconcile(self, records):
+        """
+        Relaciona las fotos del catálogo con los registros
+
+        Args:
+            records (iterable): Registros (diccionarios, cualquier esquema)
+
+        Returns:
+            dict: {
+                "referenced": {"count", "bytes"},
+                "orphans": {"count", "bytes", "paths"},
+                "missing": {"count", "records"}
+            }
+        """
+        files = {path: size for path, size in self._conn.execute("SELECT path, size FROM files")}
+        referenced = set()
+        missing = []
+        for record in records:
+            path = self._record_photo_path(record)
+            if not path:
+                continue
+            if path in files:
+                referenced.add(path)
+            else:
+                missing.append(record.get("id") or record.get("timestamp"))
+
+        orphans = sorted(path for path in files if path not in referenced)
+        return {
+            "referenced": {
+                "count": len(referenced),
+                "bytes": sum(files[p] for p in referenced)
+            },
+            "orphans": {
+                "count": len(orphans),
+                "bytes": sum(files[p] for p in orphans),
+                "paths": orphans
+            },
+            "missing": {
+                "count": len(missing),
+                "records": missing
+            }
+        }
+
+    def cleanup_orphans(self, records, min_age_days=1, dry_run=False):
+        """
+        Elimina las fotos que no pertenecen a ningún registro
+
+        Args:
+            records (iterable): Registros activos y archivados
+            min_age_days (float): Antigüedad mínima para eliminar (evita borrar
+                una captura cuyo registro aún se está guardando)
+            dry_run (bool): Solo calcular, sin eliminar
+
+        Returns:
+            tuple: (archivos eliminados, bytes liberados)
+        """
+        orphans = self.reconcile(records)["orphans"]["paths"]
+        limit_ns = int((time.time() - min_age_days * 86400) * 1e9)
+
+        removed = 0
+        freed = 0
+        with self._conn:
+            for path in orphans:
+                row = self._conn.execute(
+                    "SELECT size, mtime_ns FROM files WHERE path = ?", (path,)).fetchone()
+                if row is None or row[1] > limit_ns:
+                    continue
+                if not dry_run:
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    except OSError:
+                        continue
+                    self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+                removed += 1
+                freed += row[0]
+        return removed, freed
+
+    def close(self):
+        """Cierra el catálogo"""
+        self._conn.close()
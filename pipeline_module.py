@@ -0,0 +1,172 @@
+"""
+Módulo de envío en cadena para el Sistema de Asistencia JOLG
+
+Reenvía lotes de registros en dos etapas solapadas: mientras se registra
+la asistencia de un registro, ya se están subiendo las fotos de los
+siguientes. Cada etapa tiene su propio límite de peticiones simultáneas.
+Los registros cuyas fotos terminaron de subir se envían juntos con
+register_many: la etapa de registro espera hasta batch_wait segundos a
+que se completen batch_size registros (o a que no queden subidas en curso)
+antes de enviar el lote.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from dto import AsistenciaRecord
+
+
+class UploadPipeline:
+    """
+    Cadena subida de foto -> registro de asistencia
+
+    Para cada registro la subida siempre termina antes de empezar su
+    registro; entre registros distintos ambas etapas trabajan a la vez.
+    """
+
+    def __init__(self, api_client, upload_concurrency=2, register_concurrency=2,
+                 batch_size=None, batch_wait=0.5):
+        self.api_client = api_client
+        self.upload_concurrency = max(1, upload_concurrency)
+        self.register_concurrency = max(1, register_concurrency)
+        self.batch_size = max(1, batch_size or getattr(api_client, "batch_size", 1))
+        self.batch_wait = batch_wait
+
+    def _upload(self, record):
+        """Etapa 1: sube la foto del registro"""
+        key = AsistenciaRecord.from_dict(record).idempotency_key()
+        return self.api_client.upload_photo(record.get("foto_path"),
+                                            idempotency_key=f"{key}:foto")
+
+    def _register(self, items):
+        """Etapa 2: registra las asistencias [(record, foto_ruta)] ya subidas"""
+        if len(items) == 1:
+            return [self.api_client.register_record(*items[0])]
+        return self.api_client.register_many(items)
+
+    def run(self, records, on_result=None, should_stop=None):
+        """
+        Envía una lista de registros
+
+        Args:
+            records (list): Registros (diccionarios)
+            on_result (callable): on_result(index, record, success, result),
+                llamado desde este hilo a medida que termina cada registro
+            should_stop (callable): Devuelve True para no iniciar más envíos;
+                los registros aún no subidos se informan como cancelados
+
+        Returns:
+            list: (success: bool, result) por registro, en el orden de entrada
+        """
+        total = len(records)
+        results = [None] * total
+        if not total:
+            return results
+
+        done = queue.Queue()
+        ready = queue.Queue()
+        stopping = threading.Event()
+        uploading = [total]  # subidas aún sin terminar
+        uploading_lock = threading.Lock()
+
+        with ThreadPoolExecutor(max_workers=self.upload_concurrency) as upload_pool, \
+                ThreadPoolExecutor(max_workers=self.register_concurrency) as register_pool:
+
+            def register():
+                # Cada subida encola una tarea, así que ningún registro queda
+                # sin tomar; si otra tarea ya vació la cola, esta no hace nada
+                try:
+                    batch = [ready.get_nowait()]
+                except queue.Empty:
+                    return
+                # Completar el lote con las subidas que terminen en batch_wait
+                deadline = time.monotonic() + self.batch_wait
+                while len(batch) < self.batch_size and not stopping.is_set():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(ready.get(timeout=min(remaining, 0.05)))
+                    except queue.Empty:
+                        with uploading_lock:
+                            if not uploading[0] and ready.empty():
+                                break  # No llegarán más
+                try:
+                    batch_results = self._register(
+                        [(records[index], foto_ruta) for index, foto_ruta in batch])
+                except Exception as e:
+                    batch_results = [(False, str(e))] * len(batch)
+                for (index, _), (success, result) in zip(batch, batch_results):
+                    done.put((index, success, result))
+
+            def uploaded(index, future):
+                with uploading_lock:
+                    uploading[0] -= 1
+                if future.cancelled():
+                    done.put((index, False, "Envío cancelado"))
+                    return
+                try:
+                    success, result = future.result()
+                except Exception as e:
+                    success, result = False, str(e)
+                if not success:
+                    done.put((index, False, f"Error subiendo foto: {result}"))
+                elif stopping.is_set():
+                    done.put((index, False, "Envío cancelado"))
+                else:
+                    # Se encadena desde el hilo de subida: la foto siguiente
+                    # empieza a subir mientras este registro se envía
+                    ready.put((index, result))
+                    register_pool.submit(register)
+
+            futures = []
+            for index, record in enumerate(records):
+                future = upload_pool.submit(self._upload, record)
+                future.add_done_callback(lambda f, i=index: uploaded(i, f))
+                futures.append(future)
+
+            received = 0
+            while received < total:
+                if should_stop and not stopping.is_set() and should_stop():
+                    stopping.set()
+                    for future in futures:
+                        future.cancel()
+                try:
+                    index, success, result = done.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+
+                received += 1
+                results[index] = (success, result)
+                if on_result:
+                    on_result(index, records[index], success, result)
+
+        return results
+
+
+class ThroughputMeter:
+    """Registros completados por segundo en una ventana deslizante"""
+
+    def __init__(self, window=30.0):
+        self.window = window
+        self._events = deque()
+
+    def add(self, now=None):
+        """Anota un registro completado"""
+        now = time.monotonic() if now is None else now
+        self._events.append(now)
+        limit = now - self.window
+        while self._events and self._events[0] < limit:
+            self._events.popleft()
+
+    def rate(self, now=None):
+        """Registros por segundo en la ventana"""
+        now = time.monotonic() if now is None else now
+        events = [t for t in self._events if t >= now - self.window]
+        if len(events) < 2:
+            return 0.0
+        elapsed = now - events[0]
+        return len(events) / elapsed if elapsed > 0 else 0.0
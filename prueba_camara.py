@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Medición del recorrido de los frames de la cámara del Sistema de Asistencia JOLG
+
+Ejecuta CameraThread sin ventana visible (Qt offscreen) con la fuente de
+video indicada y pinta la vista previa en un QLabel igual que main.py.
+Informa los frames capturados y pintados, la latencia de captura a
+pintado, el costo por etapa en el hilo de captura y el uso de CPU del
+proceso por frame. Con --fuente synthetic o --fuente file no necesita
+cámara. Con --rostro mide también la detección de rostro.
+
+Uso:
+    python prueba_camara.py --fuente synthetic --duracion 10
+    python prueba_camara.py --fuente synthetic --sin-ritmo --vista 1280x960
+    python prueba_camara.py --fuente file --archivo video.mp4
+    python prueba_camara.py --fuente device --backend v4l2
+"""
+
+import argparse
+import os
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import QTimer
+from PyQt5.QtGui import QPixmap
+from PyQt5.QtWidgets import QApplication, QLabel
+
+from camera_module import CameraThread
+from config_module import load_config
+
+
+def tamano(texto):
+    """Convierte "ANCHOxALTO" en (ancho, alto)"""
+    ancho, alto = texto.lower().split("x")
+    return int(ancho), int(alto)
+
+
+def configuracion_camara(args):
+    """Sección camera de config.json con las opciones de la línea de comandos"""
+    camera_config = dict(load_config().get("camera", {}))
+    camera_config["source"] = args.fuente
+    if args.backend:
+        camera_config["backend"] = args.backend
+    if args.archivo:
+        camera_config["file"] = args.archivo
+    if args.patron:
+        camera_config["pattern"] = args.patron
+    if args.resolucion:
+        ancho, alto = tamano(args.resolucion)
+        camera_config["resolution"] = {"width": ancho, "height": alto}
+    if args.fps:
+        camera_config["fps"] = args.fps
+        camera_config["file_fps"] = args.fps
+    if args.sin_ritmo:
+        camera_config["realtime"] = False
+    if args.rostro:
+        camera_config["face_gate"] = dict(camera_config.get("face_gate", {}), enabled=True)
+    return camera_config
+
+
+class Pintor:
+    """Pinta los frames del buzón en un QLabel (como update_camera_image en main.py)"""
+
+    def __init__(self, camera_thread, label):
+        self.camera_thread = camera_thread
+        self.label = label
+
+    def pintar(self):
+        delay = self.camera_thread.mailbox.delay()
+        if delay > 0:
+            QTimer.singleShot(int(delay * 1000) + 1, self.pintar)
+            return
+        start = time.perf_counter()
+        qt_image = self.camera_thread.mailbox.take()
+        if qt_image is None:
+            return
+        try:
+            self.label.setPixmap(QPixmap.fromImage(qt_image))
+            self.label.repaint()
+            size = self.label.size()
+            self.camera_thread.set_preview_size(size.width(), size.height())
+        finally:
+            self.camera_thread.mailbox.done(time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Medición de la vista previa de la cámara")
+    parser.add_argument("--fuente", choices=["synthetic", "file", "device"], default="synthetic",
+                        help="Fuente de video (camera.source)")
+    parser.add_argument("--backend", choices=["auto", "any", "dshow", "msmf", "v4l2"],
+                        help="Backend de la cámara (camera.backend)")
+    parser.add_argument("--archivo", help="Archivo de video para --fuente file")
+    parser.add_argument("--patron", choices=["moving", "noise"], help="Patrón sintético")
+    parser.add_argument("--resolucion", help="Resolución de captura, p. ej. 1280x720")
+    parser.add_argument("--fps", type=int, help="Frames por segundo de la fuente")
+    parser.add_argument("--sin-ritmo", action="store_true",
+                        help="Entregar frames tan rápido como se pidan (sintética o archivo)")
+    parser.add_argument("--vista", default="640x480", help="Tamaño del recuadro de la vista previa")
+    parser.add_argument("--duracion", type=float, default=10, help="Segundos de medición")
+    parser.add_argument("--rostro", action="store_true",
+                        help="Activar la detección de rostro (camera.face_gate)")
+    args = parser.parse_args()
+
+    app = QApplication([])
+    camera_config = configuracion_camara(args)
+    label = QLabel()
+    label.resize(*tamano(args.vista))
+    label.show()
+
+    camera_thread = CameraThread(camera_config.get("device_id", 0), camera_config)
+    camera_thread.set_preview_size(label.width(), label.height())
+    pintor = Pintor(camera_thread, label)
+    camera_thread.frame_ready.connect(pintor.pintar)
+    errores = []
+    camera_thread.error_occurred.connect(lambda message: (errores.append(message), app.quit()))
+
+    print(f"Fuente: {camera_thread.camera.description} · vista {args.vista} · "
+          f"{args.duracion:.0f} s")
+    cpu_inicio = time.process_time()
+    inicio = time.perf_counter()
+    camera_thread.start()
+    QTimer.singleShot(int(args.duracion * 1000), app.quit)
+    app.exec_()
+    duracion = time.perf_counter() - inicio
+    cpu = time.process_time() - cpu_inicio
+    camera_thread.stop()
+
+    if errores:
+        raise SystemExit(f"Error: {errores[0]}")
+
+    frames = camera_thread.frames
+    stats = camera_thread.mailbox.stats()
+    print(f"\nFrames capturados: {frames} ({frames / duracion:.1f} fps)")
+    print(f"Frames pintados: {stats['delivered']} ({stats['delivered'] / duracion:.1f} fps) · "
+          f"{stats['dropped']} descartados · frecuencia máxima actual {stats['max_fps']:.0f} fps")
+    print(f"Latencia captura -> pintado: p50 {stats['latency_p50_ms']:.1f} ms · "
+          f"p95 {stats['latency_p95_ms']:.1f} ms")
+    print(f"Pintado (hilo de la UI): {stats['paint_ms']:.2f} ms por frame")
+    if frames:
+        etapas = " · ".join(f"{nombre} {segundos * 1000 / frames:.2f} ms"
+                            for nombre, segundos in camera_thread.stage_times.items())
+        print(f"Hilo de captura por frame: {etapas}")
+        print(f"CPU del proceso: {cpu * 1000 / frames:.2f} ms por frame "
+              f"({cpu / duracion * 100:.0f} % de un núcleo)")
+
+    face = camera_thread.face_gate.stats()
+    if face["enabled"]:
+        print(f"Detección de rostro: {face['detections']} detecciones · "
+              f"{face['cost_ms']:.2f} ms cada una · cada {face['every']} frame(s) · "
+              f"rostro {'presente' if face['present'] else 'ausente'}")
+
+    start = time.perf_counter()
+    frame, nitidez = camera_thread.ring.best()
+    if frame is not None:
+        print(f"Elegir el frame más nítido ({camera_thread.ring.size} frames): "
+              f"{(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
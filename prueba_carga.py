@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga de la API de Asistencia JOLG
+
+Simula varios kioscos registrando asistencias a la vez contra el servidor
+simulado (o la URL indicada) y reporta rendimiento y latencias.
+
+Cada kiosco es un hilo que repite el registro completo (subida de foto +
+registro de asistencia) usando APIClient directamente o AsistenciaWorker
+(ejecutado en el mismo hilo, sin interfaz). Todos comparten una sesión
+HTTP, como los hilos de la aplicación.
+
+Uso:
+    python prueba_carga.py --kioscos 8 --registros 25 --latencia 80 --tasa-error 0.02
+    python prueba_carga.py --url http://127.0.0.1:8080 --modo worker
+"""
+
+import argparse
+import glob
+import math
+import threading
+import time
+import uuid
+
+from api_module import APIClient, AsistenciaWorker
+from config_module import load_config
+from servidor_simulado import agregar_opciones_red, crear_servidor, opciones_red
+from transport_module import HttpTransport, percentile
+
+
+def foto_de_prueba(ruta=None):
+    """Bytes JPEG de prueba: la ruta indicada o la primera foto de fotos/"""
+    if ruta is None:
+        candidatas = sorted(glob.glob("fotos/*.jpg"))
+        if not candidatas:
+            raise SystemExit("No hay fotos en fotos/; indique una con --foto")
+        ruta = candidatas[0]
+    with open(ruta, 'rb') as f:
+        return f.read()
+
+
+class Kiosco(threading.Thread):
+    """Hilo que registra asistencias una tras otra"""
+
+    def __init__(self, numero, api_client, foto, registros, modo, resultados):
+        super().__init__(daemon=True)
+        self.numero = numero
+        self.api_client = api_client
+        self.foto = foto
+        self.registros = registros
+        self.modo = modo
+        self.resultados = resultados  # lista compartida de (segundos, success)
+
+    def _foto_unica(self, clave):
+        """
+        Foto distinta por registro (bytes extra tras el fin del JPEG): la
+        subida por fragmentos identifica cada subida por su contenido
+        """
+        return self.foto + clave.encode("ascii")
+
+    def _registrar_cliente(self, clave):
+        success, result = self.api_client.upload_photo(
+            f"kiosco{self.numero}.jpg", data=self._foto_unica(clave),
+            idempotency_key=f"{clave}:foto")
+        if not success:
+            return False
+        success, result = self.api_client.register_asistencia(
+            f"TIENDA{self.numero % 3 + 1}", "prueba de carga", result,
+            idempotency_key=clave)
+        return success
+
+    def _registrar_worker(self, clave):
+        worker = AsistenciaWorker(
+            f"TIENDA{self.numero % 3 + 1}", "prueba de carga", f"kiosco{self.numero}.jpg",
+            foto_data=self._foto_unica(clave), idempotency_key=clave, api_client=self.api_client)
+        estado = {}
+        worker.finished.connect(lambda success, message: estado.update(success=success))
+        worker.run()  # En este hilo: las señales se entregan de inmediato
+        return estado.get("success", False)
+
+    def run(self):
+        registrar = self._registrar_worker if self.modo == "worker" else self._registrar_cliente
+        for _ in range(self.registros):
+            clave = uuid.uuid4().hex
+            inicio = time.perf_counter()
+            try:
+                success = registrar(clave)
+            except Exception:
+                success = False
+            self.resultados.append((time.perf_counter() - inicio, success))
+
+
+def resumen(resultados, duracion):
+    """Rendimiento y percentiles de latencia de los registros"""
+    exitosos = sorted(t for t, ok in resultados if ok)
+    return {
+        "registros": len(resultados),
+        "exitosos": len(exitosos),
+        "fallidos": len(resultados) - len(exitosos),
+        "por_segundo": len(exitosos) / duracion if duracion > 0 else 0.0,
+        "p50": percentile(exitosos, 50),
+        "p95": percentile(exitosos, 95),
+        "p99": percentile(exitosos, 99)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API JOLG")
+    parser.add_argument("--kioscos", type=int, default=4, help="Kioscos simultáneos")
+    parser.add_argument("--registros", type=int, default=20, help="Registros por kiosco")
+    parser.add_argument("--modo", choices=["cliente", "worker"], default="cliente",
+                        help="Registrar con APIClient o con AsistenciaWorker")
+    parser.add_argument("--foto", help="Foto JPEG a subir (por defecto, una de fotos/)")
+    parser.add_argument("--url", help="Servidor a probar (por defecto, uno simulado local)")
+    parser.add_argument("--sin-fragmentos", action="store_true",
+                        help="Servidor simulado sin subida por fragmentos")
+    agregar_opciones_red(parser)
+    args = parser.parse_args()
+
+    servidor = None
+    url = args.url
+    if url is None:
+        servidor = crear_servidor(puerto=0, fragmentos=not args.sin_fragmentos,
+                                  **opciones_red(args))
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{servidor.server_address[1]}"
+
+    foto = foto_de_prueba(args.foto)
+    api_config = dict(load_config().get("api", {}), base_url=url,
+                      pool_size=max(args.kioscos, 1))
+    # El informe por endpoint sale de los tiempos guardados: se guardan
+    # todos (fragmentos de la foto + registro por registro, con margen
+    # para reintentos) en vez de solo los últimos timing_history
+    fragmentos = math.ceil(len(foto) / (api_config.get("chunk_size_kb", 64) * 1024))
+    api_config["timing_history"] = max(api_config.get("timing_history", 500),
+                                       2 * args.kioscos * args.registros * (fragmentos + 1))
+    # Sin interruptor de circuito: abierto por los errores inyectados haría
+    # fallar las peticiones en el cliente y se mediría el interruptor, no el
+    # servidor (aquí no corre ConnectivityMonitor que lo vuelva a cerrar)
+    api_config["breaker"] = dict(api_config.get("breaker", {}), enabled=False)
+    transport = HttpTransport(api_config)
+    api_client = APIClient(transport)
+
+    print(f"Probando {url}: {args.kioscos} kiosco(s) x {args.registros} registro(s), "
+          f"modo {args.modo}, foto de {len(foto)} bytes")
+    resultados = []
+    kioscos = [Kiosco(n, api_client, foto, args.registros, args.modo, resultados)
+               for n in range(args.kioscos)]
+    inicio = time.perf_counter()
+    for kiosco in kioscos:
+        kiosco.start()
+    for kiosco in kioscos:
+        kiosco.join()
+    duracion = time.perf_counter() - inicio
+
+    datos = resumen(resultados, duracion)
+    print(f"\nRegistros: {datos['registros']} ({datos['exitosos']} exitosos, "
+          f"{datos['fallidos']} fallidos) en {duracion:.1f} s")
+    print(f"Rendimiento: {datos['por_segundo']:.1f} registros/s")
+    print(f"Latencia por registro: p50 {datos['p50'] * 1000:.0f} ms · "
+          f"p95 {datos['p95'] * 1000:.0f} ms · p99 {datos['p99'] * 1000:.0f} ms")
+
+    print("\nPor endpoint:")
+    for endpoint in ("upload", "chunk", "register"):
+        tiempos = sorted(t["total"] for t in transport.get_timings(endpoint) if "error" not in t)
+        if not tiempos:
+            continue
+        stats = transport.get_stats(endpoint)
+        print(f"  {endpoint:<9} {stats['count']:>5} peticiones · "
+              f"{stats['errors'] + stats['http_errors']} errores "
+              f"({stats['http_errors']} respuestas 5xx/429) · "
+              f"{stats['reused']} conexiones reutilizadas · "
+              f"p50 {percentile(tiempos, 50) * 1000:.0f} ms · "
+              f"p95 {percentile(tiempos, 95) * 1000:.0f} ms · "
+              f"p99 {percentile(tiempos, 99) * 1000:.0f} ms")
+
+    if servidor:
+        estado = servidor.estado
+        print(f"\nServidor simulado: {estado.contadores['peticiones']} peticiones, "
+              f"{estado.contadores['errores_simulados']} errores simulados, "
+              f"{estado.contadores['limitadas']} limitadas (429), "
+              f"{estado.duplicados} duplicados descartados, "
+              f"{len(estado.asistencias)} asistencias")
+        servidor.shutdown()
+    transport.close()
+
+
+if __name__ == "__main__":
+    main()
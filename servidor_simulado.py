@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Servidor simulado del backend de Asistencia JOLG
+
+Implementa los endpoints que usa la aplicación para probarla sin conexión
+al servidor real:
+
+    PUT  /files/file                  subida de foto (multipart)
+    PUT  /files/chunked/<id>          subida por fragmentos (Content-Range)
+    HEAD /files/chunked/<id>          avance de una subida por fragmentos
+    POST /asistencias_jolg            registro de asistencia
+    POST /asistencias_jolg/batch      registro de varias asistencias
+    GET  /                            sonda de conectividad
+
+Para medir la aplicación en condiciones de red reales, cada petición puede
+demorarse (--latencia, --jitter), fallar con 503 (--tasa-error) o recibir
+429 con Retry-After si supera --limite peticiones por segundo.
+
+Las peticiones con encabezado Idempotency-Key se atienden una sola vez:
+un reintento (o una petición duplicada) con la misma clave recibe la
+respuesta original sin crear otra asistencia.
+
+Uso:
+    python servidor_simulado.py --puerto 8080
+    # y en config.json: "api": {"base_url": "http://127.0.0.1:8080"}
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class EstadoServidor:
+    """Estado compartido entre peticiones"""
+
+    def __init__(self, fragmentos=True, lotes=True, fallo_fragmentos=0.0,
+                 latencia=0.0, jitter=0.0, tasa_error=0.0, limite=0.0):
+        self.fragmentos = fragmentos
+        self.lotes = lotes
+        self.fallo_fragmentos = fallo_fragmentos
+        self.latencia = latencia  # segundos añadidos a cada respuesta
+        self.jitter = jitter  # variación aleatoria (+/-) de la latencia
+        self.tasa_error = tasa_error  # probabilidad de responder 503
+        self.limite = limite  # peticiones por segundo (0: sin límite)
+        self._fichas = max(1.0, limite)
+        self._recarga = time.monotonic()
+        self.contadores = {"peticiones": 0, "errores_simulados": 0, "limitadas": 0}
+        self.subidas = {}  # id -> bytearray recibido
+        self.archivos = {}  # ruta -> tamaño
+        self.asistencias = []
+        self.respuestas = {}  # (ruta, Idempotency-Key) -> (status, cuerpo)
+        self.duplicados = 0
+        self.lock = threading.Lock()
+
+    def tomar_ficha(self):
+        """Cubeta de fichas: False si la petición supera el límite por segundo"""
+        if not self.limite:
+            return True
+        with self.lock:
+            ahora = time.monotonic()
+            self._fichas = min(max(1.0, self.limite),
+                               self._fichas + (ahora - self._recarga) * self.limite)
+            self._recarga = ahora
+            if self._fichas < 1.0:
+                return False
+            self._fichas -= 1.0
+            return True
+
+
+class ManejadorSimulado(BaseHTTPRequestHandler):
+    """Atiende las peticiones con el estado de self.server.estado"""
+
+    protocol_version = "HTTP/1.1"
+    # Encabezados y cuerpo salen en escrituras separadas: sin esto, Nagle y
+    # el ACK diferido del cliente suman ~40 ms a cada respuesta
+    disable_nagle_algorithm = True
+
+    @property
+    def estado(self):
+        return self.server.estado
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _leer_cuerpo(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length) if length else b""
+
+    def _responder(self, status, body=b"", headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode("utf-8")
+        elif isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, str(value))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _perturbar(self):
+        """
+        Aplica latencia, límite y errores simulados
+
+        Returns:
+            bool: True si ya se respondió con un error simulado
+        """
+        estado = self.estado
+        with estado.lock:
+            estado.contadores["peticiones"] += 1
+        if not estado.tomar_ficha():
+            with estado.lock:
+                estado.contadores["limitadas"] += 1
+            self._responder(429, {"message": "Demasiadas peticiones"}, {"Retry-After": 1})
+            return True
+        demora = estado.latencia + random.uniform(-estado.jitter, estado.jitter)
+        if demora > 0:
+            time.sleep(demora)
+        if random.random() < estado.tasa_error:
+            with estado.lock:
+                estado.contadores["errores_simulados"] += 1
+            self._responder(503, {"message": "Error simulado"})
+            return True
+        return False
+
+    def _guardar_archivo(self, nombre, tamaño):
+        ruta = f"files/{nombre}"
+        with self.estado.lock:
+            self.estado.archivos[ruta] = tamaño
+        return ruta
+
+    def _idempotente(self, atender):
+        """
+        Responde una sola vez por Idempotency-Key
+
+        atender() se ejecuta con el lock tomado y devuelve (status, cuerpo)
+        """
+        clave = self.headers.get("Idempotency-Key")
+        with self.estado.lock:
+            previa = self.estado.respuestas.get((self.path, clave)) if clave else None
+            if previa is None:
+                previa = atender()
+                if clave and previa[0] < 400:
+                    self.estado.respuestas[(self.path, clave)] = previa
+            else:
+                self.estado.duplicados += 1
+        return self._responder(*previa)
+
+    def _registrar_asistencia(self, datos, clave=None):
+        """
+        Guarda una asistencia (con el lock tomado)
+
+        Con clave, una asistencia ya registrada con la misma clave (en un
+        POST individual o en un lote) devuelve la respuesta anterior.
+        """
+        if clave:
+            previa = self.estado.respuestas.get(("/asistencias_jolg", clave))
+            if previa is not None:
+                self.estado.duplicados += 1
+                return previa[1]
+        self.estado.asistencias.append(datos)
+        respuesta = dict(datos, id=len(self.estado.asistencias))
+        if clave:
+            self.estado.respuestas[("/asistencias_jolg", clave)] = (201, respuesta)
+        return respuesta
+
+    def do_GET(self):
+        if self._perturbar():
+            return
+        if self.path == "/":
+            return self._responder(200, {"status": "ok"})
+        self._responder(404, {"message": "Not Found"})
+
+    def do_HEAD(self):
+        if self._perturbar():
+            return
+        match = re.fullmatch(r"/files/chunked/(\w+)", self.path)
+        if not match or not self.estado.fragmentos:
+            return self._responder(404)
+        with self.estado.lock:
+            recibido = self.estado.subidas.get(match.group(1))
+        if recibido is None:
+            return self._responder(404)
+        self._responder(200, headers={"Upload-Offset": len(recibido)})
+
+    def do_PUT(self):
+        cuerpo = self._leer_cuerpo()
+        if self._perturbar():
+            return
+
+        if self.path == "/files/file":
+            match = re.search(rb'filename="([^"]+)"', cuerpo)
+            nombre = match.group(1).decode("utf-8", "replace") if match else "foto.jpg"
+
+            def guardar():
+                ruta = f"files/{nombre}"
+                self.estado.archivos[ruta] = len(cuerpo)
+                return 200, json.dumps(ruta)
+            return self._idempotente(guardar)
+
+        match = re.fullmatch(r"/files/chunked/(\w+)", self.path)
+        if not match or not self.estado.fragmentos:
+            return self._responder(404, {"message": "Not Found"})
+
+        rango = re.fullmatch(r"bytes (\d+)-(\d+)/(\d+)", self.headers.get("Content-Range", ""))
+        if not rango:
+            return self._responder(400, {"message": "Content-Range inválido"})
+        inicio, fin, total = (int(v) for v in rango.groups())
+
+        if random.random() < self.estado.fallo_fragmentos:
+            return self._responder(503, {"message": "Fallo simulado"})
+
+        upload_id = match.group(1)
+        with self.estado.lock:
+            recibido = self.estado.subidas.setdefault(upload_id, bytearray())
+            if inicio != len(recibido):
+                return self._responder(409, headers={"Upload-Offset": len(recibido)})
+            recibido.extend(cuerpo[:fin - inicio + 1])
+            completo = len(recibido) >= total
+            if completo:
+                del self.estado.subidas[upload_id]
+
+        if completo:
+            nombre = self.headers.get("X-Filename", f"{upload_id}.jpg")
+            return self._responder(201, json.dumps(self._guardar_archivo(nombre, total)))
+        self._responder(202, headers={"Upload-Offset": len(recibido)})
+
+    def do_POST(self):
+        cuerpo = self._leer_cuerpo()
+        if self._perturbar():
+            return
+        try:
+            datos = json.loads(cuerpo or b"null")
+        except ValueError:
+            return self._responder(400, {"message": "JSON inválido"})
+
+        if self.path == "/asistencias_jolg":
+            if not isinstance(datos, dict) or "personalID" not in datos:
+                return self._responder(400, {"message": "Datos inválidos"})
+
+            def registrar():
+                return 201, self._registrar_asistencia(datos)
+            return self._idempotente(registrar)
+
+        if self.path == "/asistencias_jolg/batch":
+            if not self.estado.lotes:
+                return self._responder(404, {"message": "Not Found"})
+            if not isinstance(datos, list):
+                return self._responder(400, {"message": "Se esperaba una lista"})
+
+            def registrar_lote():
+                resultados = []
+                for item in datos:
+                    if not isinstance(item, dict) or "personalID" not in item:
+                        resultados.append({"error": "Datos inválidos", "status": 400})
+                        continue
+                    # Cada elemento trae su propia clave: un registro ya
+                    # recibido (solo o en otro lote) no se duplica
+                    clave = item.pop("idempotencyKey", None)
+                    resultados.append(self._registrar_asistencia(item, clave))
+                return 201, resultados
+            return self._idempotente(registrar_lote)
+
+        self._responder(404, {"message": "Not Found"})
+
+
+def crear_servidor(host="127.0.0.1", puerto=8080, verbose=False, **opciones):
+    """Crea el servidor simulado (llamar a serve_forever() para atender)"""
+    servidor = ThreadingHTTPServer((host, puerto), ManejadorSimulado)
+    servidor.daemon_threads = True
+    servidor.estado = EstadoServidor(**opciones)
+    servidor.verbose = verbose
+    return servidor
+
+
+def agregar_opciones_red(parser):
+    """Opciones de línea de comandos para latencia, errores y límite"""
+    parser.add_argument("--latencia", type=float, default=0.0,
+                        help="Latencia añadida a cada respuesta (ms)")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="Variación aleatoria de la latencia (+/- ms)")
+    parser.add_argument("--tasa-error", type=float, default=0.0,
+                        help="Probabilidad (0-1) de responder 503 a cualquier petición")
+    parser.add_argument("--limite", type=float, default=0.0,
+                        help="Peticiones por segundo antes de responder 429 (0: sin límite)")
+
+
+def opciones_red(args):
+    """Convierte las opciones de agregar_opciones_red a argumentos de EstadoServidor"""
+    return {
+        "latencia": args.latencia / 1000,
+        "jitter": args.jitter / 1000,
+        "tasa_error": args.tasa_error,
+        "limite": args.limite
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor simulado del backend JOLG")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8080)
+    parser.add_argument("--sin-fragmentos", action="store_true",
+                        help="Responder 404 a la subida por fragmentos")
+    parser.add_argument("--sin-lotes", action="store_true",
+                        help="Responder 404 al registro por lotes")
+    parser.add_argument("--fallo-fragmentos", type=float, default=0.0,
+                        help="Probabilidad (0-1) de responder 503 a un fragmento")
+    agregar_opciones_red(parser)
+    parser.add_argument("--verbose", action="store_true", help="Mostrar cada petición")
+    args = parser.parse_args()
+
+    servidor = crear_servidor(
+        args.host, args.puerto, args.verbose,
+        fragmentos=not args.sin_fragmentos,
+        lotes=not args.sin_lotes,
+        fallo_fragmentos=args.fallo_fragmentos,
+        **opciones_red(args)
+    )
+    print(f"Servidor simulado en http://{args.host}:{args.puerto}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
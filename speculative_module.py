@@ -0,0 +1,156 @@
+"""
+Módulo de subida anticipada de fotos para el Sistema de Asistencia JOLG
+
+Al elegir un Personal ID se captura y sube una foto candidata mientras el
+operador sigue completando el formulario. Si al registrar la foto sigue
+vigente, se reutiliza su fotoRuta y el registro solo necesita el POST de
+asistencia.
+
+Reglas:
+- Se descarta al cambiar o quitar el Personal ID, si su subida falla y
+  al usarse en un registro.
+- Deja de ser vigente max_age segundos después de capturarse; mientras
+  el mismo Personal ID siga elegido se recaptura hasta max_refreshes
+  veces. Una foto vencida nunca se usa: el registro captura una nueva.
+- Si al registrar la subida sigue en curso y la foto es vigente, el
+  registro espera a que termine (ready) en lugar de volver a subir.
+"""
+
+import time
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+
+from api_module import APIClient
+from image_module import PhotoPrepWorker
+
+
+class SpeculativePhoto:
+    """Foto candidata para un Personal ID"""
+
+    def __init__(self, personal_id):
+        self.personal_id = personal_id
+        self.captured_at = time.monotonic()
+        self.foto_hash = None
+        self.data = None
+        self.info = None
+        self.foto_ruta = None
+        self.failed = False
+
+    def age(self):
+        """Segundos desde la captura"""
+        return time.monotonic() - self.captured_at
+
+    @property
+    def uploaded(self):
+        return self.foto_ruta is not None
+
+
+class SpeculativeUploadWorker(QThread):
+    """Sube una foto candidata desde memoria"""
+
+    uploaded = pyqtSignal(bool, str)  # success, fotoRuta o mensaje de error
+
+    def __init__(self, foto_path, data, idempotency_key):
+        super().__init__()
+        self.foto_path = foto_path
+        self.data = data
+        self.idempotency_key = idempotency_key
+        self.api_client = APIClient()
+
+    def run(self):
+        try:
+            success, result = self.api_client.upload_photo(
+                self.foto_path, data=self.data, idempotency_key=self.idempotency_key)
+            self.uploaded.emit(success, str(result))
+        except Exception as e:
+            self.uploaded.emit(False, f"Error inesperado: {str(e)}")
+
+
+class SpeculativeUploader(QObject):
+    """Mantiene como máximo una foto candidata (la del Personal ID elegido)"""
+
+    ready = pyqtSignal()  # la foto candidata terminó de subir (o falló)
+
+    def __init__(self, optimizer, photo_store, speculative_config=None):
+        super().__init__()
+        speculative_config = speculative_config or {}
+        self.enabled = speculative_config.get("enabled", False)
+        self.max_age = speculative_config.get("max_age", 15)
+        self.max_refreshes = speculative_config.get("max_refreshes", 2)
+        self.optimizer = optimizer
+        self.photo_store = photo_store
+        self.current = None
+        self.refreshes = 0
+        self._workers = []
+
+    def _keep(self, worker):
+        """Conserva la referencia al hilo hasta que termine"""
+        self._workers.append(worker)
+        worker.finished.connect(lambda: self._workers.remove(worker))
+        worker.start()
+
+    def start(self, personal_id, frame, refresh=False):
+        """Descarta la foto candidata actual y prepara una nueva"""
+        self.refreshes = self.refreshes + 1 if refresh else 0
+        photo = SpeculativePhoto(personal_id)
+        self.current = photo
+        prep = PhotoPrepWorker(frame, self.optimizer, self.photo_store, persist=False)
+        prep.encoded.connect(lambda h, d, i: self._encoded(photo, h, d, i))
+        prep.failed.connect(lambda message: self._settle(photo, False, message))
+        self._keep(prep)
+
+    def _encoded(self, photo, foto_hash, data, info):
+        if photo is not self.current:
+            return  # Descartada mientras se codificaba
+        photo.foto_hash, photo.data, photo.info = foto_hash, data, info
+        worker = SpeculativeUploadWorker(self.photo_store.path_for(foto_hash), data,
+                                         f"{foto_hash}:foto")
+        worker.uploaded.connect(lambda success, result: self._settle(photo, success, result))
+        self._keep(worker)
+
+    def _settle(self, photo, success, result):
+        if photo is not self.current:
+            return
+        if success:
+            photo.foto_ruta = result
+        else:
+            photo.failed = True
+            print(f"Subida anticipada fallida: {result}")
+        self.ready.emit()
+
+    def discard(self):
+        """Descarta la foto candidata (una subida en curso se ignora al terminar)"""
+        self.current = None
+        self.refreshes = 0
+
+    def _is_valid(self, personal_id):
+        photo = self.current
+        return (photo is not None and not photo.failed and
+                photo.personal_id == personal_id and photo.age() <= self.max_age)
+
+    def is_pending(self, personal_id):
+        """Hay una foto vigente para el Personal ID que aún no termina de subir"""
+        return self._is_valid(personal_id) and not self.current.uploaded
+
+    def take(self, personal_id):
+        """
+        Entrega la foto candidata si ya está subida y sigue vigente
+
+        Returns:
+            SpeculativePhoto or None: La foto (deja de ser candidata)
+        """
+        if not self._is_valid(personal_id) or not self.current.uploaded:
+            return None
+        photo = self.current
+        self.discard()
+        return photo
+
+    def needs_refresh(self, personal_id):
+        """La foto del Personal ID elegido venció y aún quedan recapturas"""
+        photo = self.current
+        return (photo is not None and photo.personal_id == personal_id and
+                photo.age() > self.max_age and self.refreshes < self.max_refreshes)
+
+    def wait(self):
+        """Espera a los hilos en curso (al cerrar la aplicación)"""
+        for worker in list(self._workers):
+            worker.wait()
@@ -0,0 +1,881 @@
+"""
+Módulo de almacenamiento local para el Sistema de Asistencia JOLG
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from dto import AsistenciaRecord, json_dumps, json_loads
+
+
+def new_record_id():
+    """Genera un identificador único para un registro"""
+    return uuid.uuid4().hex
+
+
+def record_id(record):
+    """
+    Obtiene el identificador estable de un registro
+
+    Los registros anteriores a los IDs se identifican por su timestamp.
+    """
+    return record.get("id") or record.get("timestamp")
+
+
+def encode_line(entry):
+    """Serializa un registro o una operación como una línea JSON compacta (bytes)"""
+    if isinstance(entry, AsistenciaRecord):
+        return entry.to_bytes() + b"\n"
+    return json_dumps(entry) + b"\n"
+
+
+def parse_records(items):
+    """Convierte diccionarios (cualquier esquema) en AsistenciaRecord, omitiendo inválidos"""
+    records = []
+    for item in items:
+        try:
+            records.append(AsistenciaRecord.from_dict(item))
+        except ValueError:
+            continue
+    return records
+
+
+def retention_cutoff(max_age_days):
+    """Timestamp ISO a partir del cual los registros se consideran recientes"""
+    return (datetime.now() - timedelta(days=max_age_days)).isoformat()
+
+
+def is_archivable(record, cutoff):
+    """Un registro (AsistenciaRecord) se archiva si ya fue enviado y es anterior al corte"""
+    return record.sent and record.timestamp < cutoff
+
+
+def write_archive(archive_dir, records):
+    """
+    Agrega registros a los segmentos mensuales del archivo histórico
+
+    Cada mes se guarda en archive_dir/asistencia_AAAA-MM.jsonl (un registro
+    por línea). Se escribe y sincroniza antes de quitar los registros del
+    almacenamiento activo, de modo que un corte nunca pierde datos (a lo
+    sumo un registro queda en ambos lados).
+
+    Returns:
+        list: Rutas de los segmentos modificados
+    """
+    by_month = {}
+    for record in records:
+        by_month.setdefault(record.timestamp[:7], []).append(record)
+
+    os.makedirs(archive_dir, exist_ok=True)
+    segments = []
+    for month, month_records in sorted(by_month.items()):
+        segment = os.path.join(archive_dir, f"asistencia_{month}.jsonl")
+        with open(segment, 'ab') as f:
+            f.writelines(encode_line(r) for r in month_records)
+            f.flush()
+            os.fsync(f.fileno())
+        segments.append(segment)
+    return segments
+
+
+def iter_json_array(path, chunk_size=64 * 1024):
+    """
+    Recorre los elementos de un archivo con un arreglo JSON sin cargarlo completo
+
+    Lee el archivo por bloques y decodifica un elemento a la vez, de modo
+    que la memoria usada depende del tamaño de un registro y no del archivo.
+
+    Raises:
+        ValueError: Si el archivo no es un arreglo JSON o está truncado
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buf = ""
+        pos = 0
+        started = False
+        while True:
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buf = buf[pos:] + chunk
+            pos = 0
+
+            if not started:
+                buf = buf.lstrip()
+                if not buf:
+                    if eof:
+                        return
+                    continue
+                if buf[0] != '[':
+                    raise ValueError("El archivo no contiene un arreglo JSON")
+                buf = buf[1:]
+                started = True
+
+            while True:
+                while pos < len(buf) and buf[pos] in " \t\r\n,":
+                    pos += 1
+                if pos >= len(buf):
+                    break
+                if buf[pos] == ']':
+                    return
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                except ValueError:
+                    if eof:
+                        raise
+                    break  # Elemento incompleto: leer más datos
+                yield item
+                pos = end
+
+            if eof:
+                raise ValueError("Arreglo JSON truncado")
+
+
+def migrate_records(items, storage, batch_size=1000):
+    """
+    Normaliza registros de cualquiera de los dos esquemas y los escribe en storage
+
+    Args:
+        items (iterable): Diccionarios en esquema antiguo o actual
+        storage (LocalStorage): Almacenamiento destino (cualquier backend)
+        batch_size (int): Registros por escritura
+
+    Returns:
+        dict: Conteos {"migrated", "duplicates", "rejected"}
+    """
+    report = {"migrated": 0, "duplicates": 0, "rejected": 0}
+    seen = {record_id(r) for r in storage.load_records()}
+    batch = []
+
+    def flush():
+        if batch and not storage.append_records(batch):
+            raise IOError("No se pudieron escribir los registros migrados")
+        report["migrated"] += len(batch)
+        batch.clear()
+
+    items = iter(items)
+    while True:
+        try:
+            item = next(items)
+        except StopIteration:
+            break
+        except ValueError as e:
+            # Arreglo truncado o mal formado: no se puede seguir leyendo
+            print(f"Error leyendo registros: {e}")
+            report["rejected"] += 1
+            break
+
+        try:
+            record = AsistenciaRecord.from_dict(item)
+        except ValueError:
+            report["rejected"] += 1
+            continue
+
+        if record.id in seen:
+            report["duplicates"] += 1
+            continue
+        seen.add(record.id)
+        batch.append(record)
+        if len(batch) >= batch_size:
+            flush()
+
+    flush()
+    return report
+
+
+def migrate_file(source_file, storage, batch_size=1000):
+    """Migra un archivo JSON (arreglo, cualquier esquema) a storage por streaming"""
+    return migrate_records(iter_json_array(source_file), storage, batch_size)
+
+
+def iter_archive(archive_dir):
+    """Recorre los registros (diccionarios) de todos los segmentos archivados"""
+    if not os.path.isdir(archive_dir):
+        return
+    for name in sorted(os.listdir(archive_dir)):
+        if name.startswith("asistencia_") and name.endswith(".jsonl"):
+            yield from load_archive(archive_dir, name[len("asistencia_"):-len(".jsonl")])
+
+
+def load_archive(archive_dir, month):
+    """Carga los registros archivados de un mes ('AAAA-MM')"""
+    segment = os.path.join(archive_dir, f"asistencia_{month}.jsonl")
+    if not os.path.exists(segment):
+        return []
+
+    records = []
+    with open(segment, 'rb') as f:
+        for line in f:
+            try:
+                records.append(json_loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+class LocalStorage:
+    """Maneja el almacenamiento local de registros"""
+
+    def __init__(self, storage_file="asistencia_local.json",
+                 cache_max_bytes=64 * 1024 * 1024):
+        self.storage_file = storage_file
+        # El hilo de UI y el de sincronización escriben en el mismo archivo
+        self._lock = threading.RLock()
+
+        # Caché de registros validada por (inodo, mtime, tamaño) del archivo
+        self.cache_max_bytes = cache_max_bytes
+        self._cache = None
+        self._cache_key = None
+        self._cache_index = None
+
+    def _file_key(self):
+        """Identifica la versión actual del archivo, o None si no existe"""
+        try:
+            st = os.stat(self.storage_file)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _invalidate_cache(self):
+        """Descarta la caché de registros"""
+        self._cache = None
+        self._cache_key = None
+        self._cache_index = None
+
+    def _set_cache(self, records, key):
+        """Guarda los registros en caché si no superan el límite de memoria"""
+        self._cache_index = None
+        if key is not None and key[2] <= self.cache_max_bytes:
+            self._cache = records
+            self._cache_key = key
+        else:
+            self._cache = None
+            self._cache_key = None
+
+    def _read_all(self):
+        """Lee y parsea el archivo completo; None si no se pudo leer"""
+        try:
+            with open(self.storage_file, 'rb') as f:
+                return parse_records(json_loads(f.read()))
+        except Exception:
+            return None
+
+    def _records(self):
+        """
+        Registros actuales, desde la caché si el archivo no cambió
+
+        Retorna la lista compartida de la caché: solo debe modificarse
+        con el lock tomado.
+        """
+        key = self._file_key()
+        if key is None:
+            return []
+        if self._cache is not None and key == self._cache_key:
+            return self._cache
+
+        records = self._read_all()
+        if records is None:
+            return []
+        self._set_cache(records, key)
+        return records
+
+    def _index(self, records):
+        """Índice por ID de los registros (reutilizado mientras dure la caché)"""
+        if records is not self._cache:
+            return {r.id: r for r in records}
+        if self._cache_index is None:
+            self._cache_index = {r.id: r for r in records}
+        return self._cache_index
+
+    @staticmethod
+    def _new_record(personal_id, observaciones, foto_path, sent, foto_hash=None):
+        """Crea un registro nuevo con ID único y timestamp actual"""
+        return AsistenciaRecord(new_record_id(), datetime.now().isoformat(),
+                                personal_id, observaciones, foto_path, sent, foto_hash)
+
+    def save_record(self, personal_id, observaciones, foto_path, sent=False, foto_hash=None):
+        """
+        Guarda un registro localmente
+
+        Returns:
+            dict: Registro guardado, o None si no se pudo guardar
+        """
+        record = self._new_record(personal_id, observaciones, foto_path, sent, foto_hash)
+        with self._lock:
+            records = self._records() + [record]
+            return record.to_dict() if self._write_records(records) else None
+
+    def _write_records(self, records):
+        """Reescribe el archivo completo de forma atómica y durable"""
+        tmp_file = self.storage_file + ".tmp"
+        try:
+            with open(tmp_file, 'wb') as f:
+                # Arreglo JSON compacto, un registro por línea
+                f.write(b"[\n" + b",\n".join(r.to_bytes() for r in records) + b"\n]\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.storage_file)
+            self._set_cache(records, self._file_key())
+            return True
+        except Exception:
+            self._invalidate_cache()
+            return False
+
+    def load_records(self):
+        """Carga registros desde archivo local"""
+        return [r.to_dict() for r in self._records()]
+
+    def get_pending_records(self):
+        """Obtiene registros pendientes de envío"""
+        return [r.to_dict() for r in self._records() if not r.sent]
+
+    def mark_as_sent(self, timestamp):
+        """Marca un registro como enviado"""
+        with self._lock:
+            records = self._records()
+            for record in records:
+                if record.timestamp == timestamp:
+                    record.sent = True
+                    break
+
+            self._write_records(records)
+
+    def mark_many_as_sent(self, ids):
+        """
+        Marca varios registros como enviados en una sola pasada y escritura
+
+        Args:
+            ids (iterable): IDs de registro (ver record_id)
+
+        Returns:
+            int: Cantidad de registros marcados
+        """
+        ids = set(ids)
+        if not ids:
+            return 0
+
+        with self._lock:
+            records = self._records()
+            index = self._index(records)
+            marked = 0
+            for rid in ids:
+                record = index.get(rid)
+                if record is not None and not record.sent:
+                    record.sent = True
+                    marked += 1
+
+            if marked and not self._write_records(records):
+                return 0
+            return marked
+
+    def append_records(self, records):
+        """
+        Agrega registros ya normalizados (AsistenciaRecord con id y timestamp propios)
+
+        Returns:
+            bool: True si se guardaron
+        """
+        with self._lock:
+            return self._write_records(self._records() + list(records))
+
+    def compact(self, archive_dir="archivo", max_age_days=30):
+        """
+        Mueve los registros enviados más antiguos que max_age_days a los
+        segmentos mensuales de archive_dir
+
+        Returns:
+            int: Cantidad de registros archivados
+        """
+        cutoff = retention_cutoff(max_age_days)
+        with self._lock:
+            records = self._records()
+            archived = [r for r in records if is_archivable(r, cutoff)]
+            if not archived:
+                return 0
+
+            write_archive(archive_dir, archived)
+            keep = [r for r in records if not is_archivable(r, cutoff)]
+            return len(archived) if self._write_records(keep) else 0
+
+
+class JournalStorage(LocalStorage):
+    """
+    Almacenamiento local tipo bitácora (un registro JSON por línea)
+
+    Cada registro se agrega al final del archivo y se sincroniza a disco,
+    sin reescribir el historial. Las marcas de envío también se agregan
+    como líneas de operación ({"_op": "sent", "ids": [...]}) que se aplican
+    al leer.
+    """
+
+    OP_SENT = "sent"
+
+    def __init__(self, storage_file="asistencia_local.jsonl",
+                 legacy_file="asistencia_local.json",
+                 cache_max_bytes=64 * 1024 * 1024):
+        super().__init__(storage_file, cache_max_bytes)
+        self.legacy_file = legacy_file
+        self._import_legacy()
+        self._recover()
+
+    def _import_legacy(self):
+        """Importa una única vez el archivo JSON antiguo (arreglo de registros)"""
+        if os.path.exists(self.storage_file):
+            return
+        if not self.legacy_file or not os.path.exists(self.legacy_file):
+            return
+
+        # Escribir en temporal y renombrar: si se interrumpe, se reintenta
+        tmp_file = self.storage_file + ".tmp"
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+        try:
+            report = migrate_file(self.legacy_file, JournalStorage(tmp_file, legacy_file=None))
+        except Exception as e:
+            print(f"Error importando {self.legacy_file}: {e}")
+            return
+
+        if os.path.exists(tmp_file):
+            os.replace(tmp_file, self.storage_file)
+        if report["rejected"]:
+            print(f"Importación de {self.legacy_file}: {report['rejected']} registro(s) rechazado(s)")
+
+    def _recover(self):
+        """Descarta una última línea incompleta dejada por un corte abrupto"""
+        if not os.path.exists(self.storage_file):
+            return
+
+        with open(self.storage_file, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size == 0:
+                return
+
+            # Buscar el inicio de la última línea
+            block = min(size, 64 * 1024)
+            while True:
+                f.seek(size - block)
+                tail = f.read(block)
+                cut = tail.rstrip(b"\n").rfind(b"\n")
+                if cut >= 0 or block == size:
+                    break
+                block = min(size, block * 2)
+
+            last_start = size - block + cut + 1
+            last_line = tail[cut + 1:]
+
+            if last_line.endswith(b"\n"):
+                try:
+                    json_loads(last_line)
+                    return
+                except ValueError:
+                    pass
+
+            f.truncate(last_start)
+            f.flush()
+            os.fsync(f.fileno())
+
+    _encode = staticmethod(encode_line)
+
+    def _append(self, entry):
+        """Agrega una entrada al final de la bitácora y la sincroniza a disco"""
+        return self._append_many([entry])
+
+    def _append_many(self, entries):
+        """Agrega varias entradas con una sola escritura y sincronización"""
+        with self._lock:
+            cache_valid = self._cache is not None and self._file_key() == self._cache_key
+            try:
+                with open(self.storage_file, 'ab') as f:
+                    f.writelines(self._encode(entry) for entry in entries)
+                    f.flush()
+                    os.fsync(f.fileno())
+            except Exception:
+                self._invalidate_cache()
+                return False
+
+            # Actualizar la caché en sitio en lugar de releer el archivo
+            if cache_valid:
+                for entry in entries:
+                    self._apply(entry)
+                self._cache_key = self._file_key()
+            else:
+                self._invalidate_cache()
+            return True
+
+    def append_records(self, records):
+        """Agrega registros ya normalizados al final de la bitácora"""
+        return self._append_many(list(records))
+
+    def _apply(self, entry):
+        """Aplica una entrada recién escrita a la caché de registros"""
+        records = self._cache
+        if isinstance(entry, AsistenciaRecord):
+            records.append(entry)
+            if self._cache_index is not None:
+                self._cache_index[entry.id] = entry
+            return
+
+        if 'ids' in entry:
+            index = self._index(records)
+            targets = [index.get(rid) for rid in entry['ids']]
+        else:
+            targets = [next((r for r in records
+                             if r.timestamp == entry.get('timestamp')), None)]
+        for record in targets:
+            if record is not None:
+                record.sent = True
+
+    def save_record(self, personal_id, observaciones, foto_path, sent=False, foto_hash=None):
+        """Guarda un registro agregándolo al final de la bitácora"""
+        record = self._new_record(personal_id, observaciones, foto_path, sent, foto_hash)
+        return record.to_dict() if self._append(record) else None
+
+    def _read_all(self):
+        """Carga registros reproduciendo la bitácora"""
+        try:
+            with open(self.storage_file, 'rb') as f:
+                return self._replay(f)
+        except Exception:
+            return None
+
+    def _replay(self, lines):
+        """Reproduce entradas de la bitácora y retorna los registros resultantes"""
+        records = []
+        by_id = {}
+        by_timestamp = {}
+        for line in lines:
+            try:
+                entry = json_loads(line)
+            except ValueError:
+                continue  # Línea dañada, se ignora
+
+            if isinstance(entry, dict) and entry.get('_op') == self.OP_SENT:
+                if 'ids' in entry:
+                    targets = (by_id.get(rid) for rid in entry['ids'])
+                else:
+                    targets = (by_timestamp.get(entry.get('timestamp')),)
+                for record in targets:
+                    if record is not None:
+                        record.sent = True
+                continue
+
+            try:
+                record = AsistenciaRecord.from_dict(entry)
+            except ValueError:
+                continue
+            records.append(record)
+            by_id[record.id] = record
+            by_timestamp.setdefault(record.timestamp, record)
+
+        return records
+
+    def mark_as_sent(self, timestamp):
+        """Marca un registro como enviado agregando una línea de operación"""
+        self._append({"_op": self.OP_SENT, "timestamp": timestamp})
+
+    def mark_many_as_sent(self, ids):
+        """Marca varios registros como enviados con una sola línea de operación"""
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return 0
+        with self._lock:
+            # Solo los registros existentes que aún no estaban enviados
+            index = self._index(self._records())
+            ids = [rid for rid in ids if rid in index and not index[rid].sent]
+            if not ids:
+                return 0
+            return len(ids) if self._append({"_op": self.OP_SENT, "ids": ids}) else 0
+
+    def compact(self, archive_dir="archivo", max_age_days=30):
+        """
+        Archiva los registros enviados antiguos y reescribe la bitácora
+
+        El trabajo pesado se hace sobre una instantánea sin bloquear las
+        escrituras; solo el reemplazo final toma el lock, copiando las
+        líneas agregadas mientras tanto. Los lectores ven siempre el
+        archivo anterior o el nuevo completo (os.replace es atómico).
+        """
+        if not os.path.exists(self.storage_file):
+            return 0
+
+        with open(self.storage_file, 'rb') as f:
+            snapshot = f.read()
+        # Solo se consideran líneas completas de la instantánea
+        snapshot_size = snapshot.rfind(b"\n") + 1
+        records = self._replay(snapshot[:snapshot_size].splitlines())
+        del snapshot
+
+        cutoff = retention_cutoff(max_age_days)
+        archived = [r for r in records if is_archivable(r, cutoff)]
+        if not archived:
+            return 0
+        write_archive(archive_dir, archived)
+
+        tmp_file = self.storage_file + ".tmp"
+        with open(tmp_file, 'wb') as f:
+            f.writelines(encode_line(r) for r in records if not is_archivable(r, cutoff))
+
+        with self._lock:
+            with open(self.storage_file, 'rb') as src, open(tmp_file, 'ab') as dst:
+                src.seek(snapshot_size)
+                dst.write(src.read())
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.replace(tmp_file, self.storage_file)
+            self._invalidate_cache()
+
+        return len(archived)
+
+
+class SQLiteStorage(LocalStorage):
+    """
+    Almacenamiento local sobre SQLite (modo WAL) con índices
+
+    Mantiene la misma API pública que LocalStorage, pero las consultas de
+    pendientes, historial por persona y rangos por día usan índices en
+    lugar de recorrer todo el historial.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            uid TEXT,
+            timestamp TEXT NOT NULL,
+            personal_id TEXT,
+            observaciones TEXT,
+            foto_path TEXT,
+            sent INTEGER NOT NULL DEFAULT 0,
+            foto_hash TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_records_pending
+            ON records (timestamp) WHERE sent = 0;
+        CREATE INDEX IF NOT EXISTS idx_records_personal
+            ON records (personal_id, timestamp);
+        CREATE INDEX IF NOT EXISTS idx_records_timestamp
+            ON records (timestamp);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    COLUMNS = "uid, timestamp, personal_id, observaciones, foto_path, sent, foto_hash"
+
+    def __init__(self, storage_file="asistencia_local.db",
+                 legacy_file="asistencia_local.json"):
+        super().__init__(storage_file)
+        self.legacy_file = legacy_file
+        self._conn = sqlite3.connect(storage_file, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._migrate()
+        self._conn.commit()
+
+        if legacy_file:
+            self.import_json(legacy_file)
+
+    def _migrate(self):
+        """Agrega las columnas uid y foto_hash a bases creadas antes de existir"""
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(records)")]
+        if "uid" not in columns:
+            self._conn.execute("ALTER TABLE records ADD COLUMN uid TEXT")
+        if "foto_hash" not in columns:
+            self._conn.execute("ALTER TABLE records ADD COLUMN foto_hash TEXT")
+        self._conn.execute("UPDATE records SET uid = timestamp WHERE uid IS NULL")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_records_uid ON records (uid)"
+        )
+
+    @staticmethod
+    def _to_record(row):
+        """Convierte una fila a AsistenciaRecord"""
+        return AsistenciaRecord(row[0], row[1], row[2], row[3], row[4], bool(row[5]), row[6])
+
+    def _fetch(self, sql, params=()):
+        """Ejecuta una consulta y retorna los registros como AsistenciaRecord"""
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._to_record(row) for row in rows]
+
+    def _query(self, sql, params=()):
+        """Ejecuta una consulta y retorna los registros como diccionarios"""
+        return [r.to_dict() for r in self._fetch(sql, params)]
+
+    def import_json(self, json_file):
+        """
+        Importa una única vez un archivo JSON antiguo (arreglo de registros)
+
+        Args:
+            json_file (str): Ruta del archivo JSON
+
+        Returns:
+            int: Cantidad de registros importados (0 si ya se importó)
+        """
+        if not os.path.exists(json_file):
+            return 0
+
+        key = f"imported:{os.path.abspath(json_file)}"
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+                return 0
+
+        try:
+            report = migrate_file(json_file, self)
+        except Exception as e:
+            print(f"Error importando {json_file}: {e}")
+            return 0
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?)",
+                (key, datetime.now().isoformat())
+            )
+        return report["migrated"]
+
+    def append_records(self, records):
+        """Agrega registros ya normalizados (AsistenciaRecord) en una sola transacción"""
+        rows = [
+            (r.id, r.timestamp, r.personalID, r.observaciones, r.foto_path, int(r.sent),
+             r.foto_hash)
+            for r in records
+        ]
+        try:
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    f"INSERT INTO records ({self.COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+                )
+            return True
+        except Exception:
+            return False
+
+    def save_record(self, personal_id, observaciones, foto_path, sent=False, foto_hash=None):
+        """Guarda un registro localmente"""
+        record = self._new_record(personal_id, observaciones, foto_path, sent, foto_hash)
+        return record.to_dict() if self.append_records([record]) else None
+
+    def load_records(self):
+        """Carga todos los registros"""
+        return self._query(f"SELECT {self.COLUMNS} FROM records ORDER BY id")
+
+    def get_pending_records(self):
+        """Obtiene registros pendientes de envío"""
+        return self._query(
+            f"SELECT {self.COLUMNS} FROM records WHERE sent = 0 ORDER BY timestamp"
+        )
+
+    def get_records_by_personal(self, personal_id):
+        """Obtiene el historial de un Personal ID"""
+        return self._query(
+            f"SELECT {self.COLUMNS} FROM records WHERE personal_id = ? ORDER BY timestamp",
+            (personal_id,)
+        )
+
+    def get_records_between(self, start, end):
+        """
+        Obtiene los registros en un rango de fechas [start, end)
+
+        Args:
+            start (str): Fecha/hora ISO inicial (inclusive)
+            end (str): Fecha/hora ISO final (exclusiva)
+        """
+        return self._query(
+            f"SELECT {self.COLUMNS} FROM records "
+            "WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp",
+            (start, end)
+        )
+
+    def get_records_for_day(self, day):
+        """Obtiene los registros de un día (date o 'YYYY-MM-DD')"""
+        day = day if isinstance(day, str) else day.isoformat()
+        return self.get_records_between(day, day + "T99")
+
+    def mark_as_sent(self, timestamp):
+        """Marca un registro como enviado"""
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "UPDATE records SET sent = 1 WHERE id = "
+                    "(SELECT id FROM records WHERE timestamp = ? AND sent = 0 LIMIT 1)",
+                    (timestamp,)
+                )
+        except Exception:
+            pass
+
+    def mark_many_as_sent(self, ids):
+        """Marca varios registros como enviados en una sola transacción"""
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return 0
+        try:
+            with self._lock, self._conn:
+                cursor = self._conn.executemany(
+                    "UPDATE records SET sent = 1 WHERE uid = ? AND sent = 0",
+                    [(rid,) for rid in ids]
+                )
+            return cursor.rowcount
+        except Exception:
+            return 0
+
+    def compact(self, archive_dir="archivo", max_age_days=30):
+        """
+        Mueve los registros enviados antiguos a los segmentos mensuales
+
+        Con WAL, los lectores siguen consultando durante el borrado.
+        """
+        archived = self._fetch(
+            f"SELECT {self.COLUMNS} FROM records "
+            "WHERE sent = 1 AND timestamp < ? ORDER BY timestamp",
+            (retention_cutoff(max_age_days),)
+        )
+        if not archived:
+            return 0
+
+        write_archive(archive_dir, archived)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM records WHERE uid = ? AND sent = 1",
+                [(r.id,) for r in archived]
+            )
+        return len(archived)
+
+    def close(self):
+        """Cierra la conexión a la base de datos"""
+        with self._lock:
+            self._conn.close()
+
+
+def create_storage(config=None):
+    """
+    Crea el almacenamiento local según la sección "storage" de la configuración
+
+    Args:
+        config (dict): Configuración completa (ver config_module.load_config)
+
+    Returns:
+        LocalStorage: Instancia del backend configurado
+    """
+    storage_config = (config or {}).get("storage", {})
+    backend = storage_config.get("backend", "json")
+    local_file = storage_config.get("local_file", "asistencia_local.json")
+    cache_max_bytes = int(storage_config.get("cache_max_mb", 64) * 1024 * 1024)
+
+    if backend == "sqlite":
+        return SQLiteStorage(
+            storage_config.get("sqlite_file", "asistencia_local.db"),
+            legacy_file=local_file
+        )
+
+    if backend == "journal":
+        return JournalStorage(
+            storage_config.get("journal_file", "asistencia_local.jsonl"),
+            legacy_file=local_file,
+            cache_max_bytes=cache_max_bytes
+        )
+
+    return LocalStorage(local_file, cache_max_bytes=cache_max_bytes)
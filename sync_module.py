@@ -0,0 +1,180 @@
+"""
+Módulo de sincronización en segundo plano para el Sistema de Asistencia JOLG
+
+Reenvía al servidor los registros guardados localmente con sent=False
+(por ejemplo, los registrados durante un corte de conexión).
+"""
+
+import os
+import random
+import threading
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from api_module import APIClient
+from pipeline_module import UploadPipeline, ThroughputMeter
+from storage_module import record_id
+
+
+class SyncWorker(QThread):
+    """
+    Hilo de larga duración que drena los registros pendientes
+
+    Cada ronda toma get_pending_records(), los reenvía por una cadena
+    subida -> registro (UploadPipeline) con límites de concurrencia por
+    etapa y marca como enviados los que tienen éxito. Si una ronda falla, espera con backoff exponencial
+    y jitter antes de reintentar.
+    """
+
+    backlog_changed = pyqtSignal(int)  # registros pendientes
+    record_synced = pyqtSignal(str)  # ID del registro enviado
+    replay_progress = pyqtSignal(int, int, float)  # procesados, total de la ronda, registros/s
+
+    def __init__(self, local_storage, sync_config=None, photo_store=None):
+        super().__init__()
+        sync_config = sync_config or {}
+        self.local_storage = local_storage
+        self.photo_store = photo_store
+        self.interval = sync_config.get("interval", 60)
+        # max_concurrency (anterior) sirve de valor por defecto para ambas etapas
+        concurrency = sync_config.get("max_concurrency", 2)
+        self.upload_concurrency = sync_config.get("upload_concurrency", concurrency)
+        self.register_concurrency = sync_config.get("register_concurrency", concurrency)
+        self.backoff_base = sync_config.get("backoff_base", 5)
+        self.backoff_max = sync_config.get("backoff_max", 600)
+        self.mark_batch_size = sync_config.get("mark_batch_size", 20)
+        self.api_client = APIClient()
+        self.pipeline = UploadPipeline(self.api_client, self.upload_concurrency,
+                                       self.register_concurrency,
+                                       batch_wait=sync_config.get("batch_wait", 0.5))
+        self.throughput = ThroughputMeter()
+
+        self.running = False
+        self.failures = 0
+        self._wake = threading.Event()
+        self._held = set()
+        self._held_lock = threading.Lock()
+
+    def hold(self, rid):
+        """Excluye un registro (por ID) que se está enviando desde la UI"""
+        with self._held_lock:
+            self._held.add(rid)
+
+    def release(self, rid):
+        """Devuelve un registro a la cola de sincronización"""
+        with self._held_lock:
+            self._held.discard(rid)
+
+    def sync_now(self):
+        """Fuerza una ronda de sincronización inmediata"""
+        self._wake.set()
+
+    def next_delay(self):
+        """Calcula la espera hasta la próxima ronda (backoff con jitter completo)"""
+        if self.failures == 0:
+            return self.interval
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (self.failures - 1)))
+        return random.uniform(0, delay)
+
+    def _is_sendable(self, record):
+        """Indica si el registro puede reenviarse en esta ronda"""
+        with self._held_lock:
+            if record_id(record) in self._held:
+                return False
+        foto_path = record.get("foto_path")
+        return bool(record.get("personalID")) and bool(foto_path) and os.path.exists(foto_path)
+
+    def sync_once(self):
+        """
+        Ejecuta una ronda de sincronización
+
+        Returns:
+            bool: True si no hubo fallos de envío
+        """
+        pending = self.local_storage.get_pending_records()
+        self.backlog_changed.emit(len(pending))
+        if self.api_client.transport.breaker.is_open():
+            # Sin conexión: se espera a que la sonda cierre el circuito
+            return True
+
+        sendable = [r for r in pending if self._is_sendable(r)]
+        if not sendable:
+            return True
+
+        state = {"remaining": len(pending), "processed": 0, "all_ok": True}
+        sent_ids = []
+
+        def on_result(index, record, success, result):
+            state["processed"] += 1
+            if success:
+                # Se marcan por lotes desde este hilo (una escritura por lote)
+                sent_ids.append(record_id(record))
+                if len(sent_ids) >= self.mark_batch_size:
+                    self.local_storage.mark_many_as_sent(sent_ids)
+                    sent_ids.clear()
+                state["remaining"] -= 1
+                self.throughput.add()
+                self.backlog_changed.emit(state["remaining"])
+                self.record_synced.emit(record_id(record))
+            else:
+                state["all_ok"] = False
+                print(f"Sincronización fallida ({record['timestamp']}): {result}")
+            self.replay_progress.emit(state["processed"], len(sendable),
+                                      self.throughput.rate())
+
+        self.pipeline.run(sendable, on_result, should_stop=lambda: not self.running)
+
+        remaining = state["remaining"]
+        all_ok = state["all_ok"]
+        if sent_ids:
+            self.local_storage.mark_many_as_sent(sent_ids)
+        if remaining < len(pending) and self.photo_store:
+            # Hay fotos recién enviadas que ahora pueden liberarse
+            self.photo_store.enforce_budget(self.local_storage)
+        return all_ok
+
+    def run(self):
+        """Bucle principal de sincronización"""
+        self.running = True
+        while self.running:
+            try:
+                ok = self.sync_once()
+            except Exception as e:
+                print(f"Error en sincronización: {e}")
+                ok = False
+
+            self.failures = 0 if ok else self.failures + 1
+            self._wake.wait(self.next_delay())
+            self._wake.clear()
+
+    def stop(self):
+        """Detiene la sincronización"""
+        self.running = False
+        self._wake.set()
+        self.wait()
+
+
+class CompactionWorker(QThread):
+    """
+    Hilo que archiva los registros enviados antiguos y aplica el
+    presupuesto de fotos sin bloquear la UI
+    """
+
+    compacted = pyqtSignal(int)  # registros archivados
+
+    def __init__(self, local_storage, storage_config=None, photo_store=None):
+        super().__init__()
+        storage_config = storage_config or {}
+        self.local_storage = local_storage
+        self.photo_store = photo_store
+        self.archive_dir = storage_config.get("archive_dir", "archivo")
+        self.retention_days = storage_config.get("retention_days", 30)
+
+    def run(self):
+        """Ejecuta una pasada de compactación"""
+        try:
+            archived = self.local_storage.compact(self.archive_dir, self.retention_days)
+            if self.photo_store:
+                self.photo_store.enforce_budget(self.local_storage)
+            self.compacted.emit(archived)
+        except Exception as e:
+            print(f"Error compactando almacenamiento local: {e}")
@@ -0,0 +1,119 @@
+"""
+Pruebas de JournalStorage (bitácora local de registros)
+
+Ejecutar con:
+    python -m pytest -q test_storage_module.py
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+import storage_module
+from dto import AsistenciaRecord
+from storage_module import JournalStorage, iter_archive, new_record_id
+
+
+def registro(dias_atras=0, sent=False, personal_id="TIENDA1"):
+    """Registro normalizado con timestamp de hace dias_atras días"""
+    timestamp = (datetime.now() - timedelta(days=dias_atras)).isoformat()
+    return AsistenciaRecord(new_record_id(), timestamp, personal_id, "", None, sent)
+
+
+def test_linea_final_incompleta_se_trunca_al_abrir(tmp_path):
+    ruta = tmp_path / "bitacora.jsonl"
+    storage = JournalStorage(str(ruta), legacy_file=None)
+    guardado = storage.save_record("TIENDA1", "", None)
+    tamano = ruta.stat().st_size
+
+    # Corte abrupto a mitad de la escritura del siguiente registro
+    with open(ruta, "ab") as f:
+        f.write(b'{"id": "cortado", "timestamp": "2024-')
+
+    storage = JournalStorage(str(ruta), legacy_file=None)
+    assert ruta.stat().st_size == tamano
+    assert [r["id"] for r in storage.load_records()] == [guardado["id"]]
+
+    # La siguiente escritura empieza en una línea propia
+    storage.save_record("TIENDA2", "", None)
+    assert len(JournalStorage(str(ruta), legacy_file=None).load_records()) == 2
+
+
+def test_importacion_del_archivo_antiguo_una_sola_vez(tmp_path):
+    antiguo = tmp_path / "asistencia_local.json"
+    antiguo.write_text(json.dumps([
+        {"usuarioJolg": "tienda1", "timestamp": "2024-01-01T08:00:00", "enviado": True},
+        {"personalID": "TIENDA2", "timestamp": "2024-01-01T09:00:00", "sent": False}
+    ]), encoding="utf-8")
+    ruta = tmp_path / "asistencia_local.jsonl"
+
+    storage = JournalStorage(str(ruta), legacy_file=str(antiguo))
+    assert len(storage.load_records()) == 2
+
+    # Con la bitácora ya creada, el archivo antiguo no se vuelve a importar
+    # (ni siquiera los registros que se le agreguen después)
+    storage.save_record("TIENDA3", "", None)
+    antiguo.write_text(json.dumps([
+        {"personalID": "TIENDA1", "timestamp": "2024-01-02T08:00:00", "sent": False}
+    ]), encoding="utf-8")
+    storage = JournalStorage(str(ruta), legacy_file=str(antiguo))
+    assert len(storage.load_records()) == 3
+    assert not os.path.exists(str(ruta) + ".tmp")
+
+
+def test_mark_many_as_sent_cuenta_solo_los_cambiados(tmp_path):
+    storage = JournalStorage(str(tmp_path / "bitacora.jsonl"), legacy_file=None)
+    pendiente, enviado = registro(), registro(sent=True)
+    storage.append_records([pendiente, enviado])
+
+    ids = [pendiente.id, enviado.id, "desconocido", pendiente.id]
+    assert storage.mark_many_as_sent(ids) == 1
+    assert storage.mark_many_as_sent(ids) == 0
+    assert storage.get_pending_records() == []
+
+
+def test_compactacion_concurrente_no_pierde_lineas_ni_marcas(tmp_path, monkeypatch):
+    ruta = tmp_path / "bitacora.jsonl"
+    archivo = tmp_path / "archivo"
+    storage = JournalStorage(str(ruta), legacy_file=None)
+    antiguos_enviados = [registro(60, sent=True) for _ in range(200)]
+    antiguos_pendientes = [registro(60) for _ in range(50)]
+    storage.append_records(antiguos_enviados + antiguos_pendientes)
+
+    nuevos = []
+    compactando = threading.Event()
+    agregados = threading.Event()
+
+    def agregar():
+        # Escribe mientras compact() trabaja sobre su instantánea
+        compactando.wait(5)
+        for n in range(100):
+            nuevo = storage.save_record("TIENDA1", f"nuevo {n}", None)
+            nuevos.append(nuevo["id"])
+            if n % 2:
+                storage.mark_many_as_sent([nuevo["id"]])
+        storage.mark_many_as_sent([r.id for r in antiguos_pendientes[:25]])
+        agregados.set()
+
+    write_archive = storage_module.write_archive
+
+    def write_archive_lento(archive_dir, records):
+        compactando.set()
+        agregados.wait(5)
+        return write_archive(archive_dir, records)
+
+    monkeypatch.setattr(storage_module, "write_archive", write_archive_lento)
+    hilo = threading.Thread(target=agregar)
+    hilo.start()
+    assert storage.compact(str(archivo), max_age_days=30) == 200
+    hilo.join()
+    assert agregados.is_set()
+
+    registros = {r["id"]: r for r in JournalStorage(str(ruta), legacy_file=None).load_records()}
+    assert set(registros) == set(nuevos) | {r.id for r in antiguos_pendientes}
+    for n, rid in enumerate(nuevos):
+        assert registros[rid]["sent"] == bool(n % 2)
+    for n, record in enumerate(antiguos_pendientes):
+        assert registros[record.id]["sent"] == (n < 25)
+    assert {r["id"] for r in iter_archive(str(archivo))} == {r.id for r in antiguos_enviados}
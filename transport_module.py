@@ -0,0 +1,382 @@
+"""
+Módulo de transporte HTTP para el Sistema de Asistencia JOLG
+
+Una sola sesión de requests compartida por todo el proceso, con pool de
+conexiones keep-alive, timeouts de conexión y lectura por endpoint, y
+registro de tiempos por petición.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from config_module import load_config
+
+
+# Tiempos de la conexión abierta durante la petición en curso (por hilo)
+_connect_timing = threading.local()
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    """Conexión HTTP que mide el tiempo de establecimiento (DNS + TCP)"""
+
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _connect_timing.seconds = time.perf_counter() - start
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    """Conexión HTTPS que mide el tiempo de establecimiento (DNS + TCP + TLS)"""
+
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _connect_timing.seconds = time.perf_counter() - start
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    """Adaptador que usa las conexiones con medición de tiempos"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool
+        }
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Petición rechazada sin intentarla: el circuito está abierto"""
+
+
+class CircuitBreaker:
+    """
+    Interruptor de circuito del servidor
+
+    Estados:
+    - online: cerrado, la última petición tuvo éxito
+    - degraded: cerrado, pero con fallos seguidos desde el último éxito
+    - offline: abierto tras failure_threshold fallos seguidos; las
+      peticiones fallan al instante hasta que una sonda confirma que el
+      servidor responde (ConnectivityMonitor)
+
+    Con enabled=False cuenta los fallos pero nunca se abre (pruebas de
+    carga que no deben medir el interruptor).
+    """
+
+    ONLINE = "online"
+    DEGRADED = "degraded"
+    OFFLINE = "offline"
+
+    def __init__(self, failure_threshold=3, enabled=True):
+        self.failure_threshold = max(1, failure_threshold)
+        self.enabled = enabled
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def is_open(self):
+        return self.opened_at is not None
+
+    def state(self):
+        """Estado actual: online, degraded u offline"""
+        with self._lock:
+            if self.opened_at is not None:
+                return self.OFFLINE
+            return self.DEGRADED if self.failures else self.ONLINE
+
+    def record_success(self):
+        """El servidor respondió: se cierra el circuito"""
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        """Fallo de red o 5xx: abre el circuito al alcanzar el umbral"""
+        with self._lock:
+            self.failures += 1
+            if (self.enabled and self.failures >= self.failure_threshold and
+                    self.opened_at is None):
+                self.opened_at = time.monotonic()
+
+
+class HttpTransport:
+    """
+    Transporte HTTP compartido con keep-alive y medición de tiempos
+
+    Cada petición queda registrada con:
+    - connect: establecimiento de conexión nueva (DNS + TCP + TLS); 0 si
+      se reutilizó una conexión del pool
+    - ttfb: hasta recibir los encabezados de respuesta
+    - total: incluyendo la lectura completa del cuerpo
+    """
+
+    DEFAULT_TIMEOUT = {"connect": 5, "read": 30}
+
+    def __init__(self, api_config=None):
+        api_config = api_config or {}
+        self.base_url = api_config.get("base_url", "https://backend-admin.consorciolorenzo.com")
+        self.upload_path = api_config.get("upload_endpoint", "/files/file")
+        self.asistencia_path = api_config.get("asistencia_endpoint", "/asistencias_jolg")
+        self.chunked_path = api_config.get("chunked_endpoint", "/files/chunked")
+        self.upload_mode = api_config.get("upload_mode", "auto")
+        self.chunk_size = api_config.get("chunk_size_kb", 64) * 1024
+        self.chunk_retries = api_config.get("chunk_retries", 3)
+        self.chunk_state_dir = api_config.get("chunk_state_dir", "temp/subidas")
+        # None: aún no se sabe si el servidor acepta fragmentos / lotes
+        # (se descubre al usarlo y se recuerda para todo el proceso)
+        self.chunked_supported = None
+        self.batch_path = api_config.get("batch_endpoint", "/asistencias_jolg/batch")
+        self.batch_size = api_config.get("batch_size", 20)
+        self.batch_max_bytes = api_config.get("batch_max_kb", 256) * 1024
+        self.batch_supported = None
+        self.timeouts = api_config.get("timeouts", {})
+        pool_size = api_config.get("pool_size", 4)
+        self.pool_size = pool_size
+
+        # Compatibilidad: el timeout plano antiguo es el de lectura por defecto
+        self.default_timeout = dict(self.DEFAULT_TIMEOUT)
+        if "timeout" in api_config:
+            self.default_timeout["read"] = api_config["timeout"]
+        self.default_timeout.update(self.timeouts.get("default", {}))
+
+        self.session = requests.Session()
+        adapter = _TimedAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        hedging = api_config.get("hedging", {})
+        self.hedging_enabled = hedging.get("enabled", False)
+        self.hedge_endpoints = set(hedging.get("endpoints", ["upload", "register"]))
+        self.hedge_percentile = hedging.get("percentile", 95)
+        self.hedge_min_samples = hedging.get("min_samples", 20)
+        self.hedge_default_delay = hedging.get("default_delay", 2.0)
+        self.hedge_min_delay = hedging.get("min_delay", 0.2)
+        self._hedge_pool = None
+        self._hedge_pool_lock = threading.Lock()
+
+        breaker_config = api_config.get("breaker", {})
+        self.breaker = CircuitBreaker(breaker_config.get("failure_threshold", 3),
+                                      breaker_config.get("enabled", True))
+        self.health_path = breaker_config.get("health_endpoint", "/")
+
+        self._timings = deque(maxlen=api_config.get("timing_history", 500))
+        self._timings_lock = threading.Lock()
+
+    def timeout_for(self, endpoint):
+        """Timeout (conexión, lectura) configurado para un endpoint"""
+        timeout = dict(self.default_timeout)
+        timeout.update(self.timeouts.get(endpoint, {}))
+        return (timeout["connect"], timeout["read"])
+
+    def request(self, method, url, endpoint="default", **kwargs):
+        """
+        Ejecuta una petición por la sesión compartida
+
+        Args:
+            method (str): Método HTTP
+            url (str): URL completa
+            endpoint (str): Nombre del endpoint (para timeouts y tiempos)
+            **kwargs: Argumentos de requests.Session.request
+
+        Returns:
+            requests.Response: Respuesta con el cuerpo ya leído
+
+        Raises:
+            CircuitOpenError: Si el circuito está abierto (sin intentar la petición)
+            requests.exceptions.RequestException: Errores de red
+        """
+        if self.breaker.is_open():
+            raise CircuitOpenError("Servidor no disponible (circuito abierto)")
+        hedge = kwargs.pop("_hedge", False)
+        kwargs.setdefault("timeout", self.timeout_for(endpoint))
+        _connect_timing.seconds = 0.0
+        start = time.perf_counter()
+        timing = {"endpoint": endpoint, "method": method, "started": time.time()}
+        if hedge:
+            timing["hedge"] = True
+        try:
+            response = self.session.request(method, url, **kwargs)
+            timing["ttfb"] = response.elapsed.total_seconds()
+            response.content  # Leer el cuerpo dentro de la medición total
+            timing["status"] = response.status_code
+            if response.status_code >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            return response
+        except requests.exceptions.RequestException as e:
+            timing["error"] = type(e).__name__
+            self.breaker.record_failure()
+            raise
+        finally:
+            timing["connect"] = _connect_timing.seconds
+            timing["reused"] = _connect_timing.seconds == 0.0
+            timing["total"] = time.perf_counter() - start
+            with self._timings_lock:
+                self._timings.append(timing)
+
+    def should_hedge(self, endpoint):
+        """Indica si las peticiones idempotentes a un endpoint se duplican"""
+        return self.hedging_enabled and endpoint in self.hedge_endpoints
+
+    def hedge_delay(self, endpoint):
+        """
+        Espera antes de enviar la petición duplicada: el percentil
+        configurado (p95) de los tiempos del endpoint, o default_delay
+        mientras no haya min_samples mediciones
+        """
+        totals = sorted(t["total"] for t in self.get_timings(endpoint)
+                        if "error" not in t and not t.get("hedge"))
+        if len(totals) < self.hedge_min_samples:
+            return self.hedge_default_delay
+        return max(self.hedge_min_delay, percentile(totals, self.hedge_percentile))
+
+    def _hedge_executor(self):
+        with self._hedge_pool_lock:
+            if self._hedge_pool is None:
+                # Una petición principal y su duplicado por cada conexión del pool
+                self._hedge_pool = ThreadPoolExecutor(
+                    max_workers=2 * self.pool_size, thread_name_prefix="hedge")
+            return self._hedge_pool
+
+    def hedged_request(self, method, url, endpoint="default", **kwargs):
+        """
+        Petición con duplicado diferido: si no hay respuesta tras
+        hedge_delay(endpoint), se envía una segunda petición idéntica y se
+        usa la primera respuesta válida (< 500)
+
+        Solo debe usarse con peticiones idempotentes (con Idempotency-Key):
+        el servidor puede recibir ambas. El cuerpo debe poder reenviarse
+        (bytes, no un archivo abierto).
+
+        Returns:
+            requests.Response
+
+        Raises:
+            requests.exceptions.RequestException: Si ambas peticiones fallan
+        """
+        if not self.should_hedge(endpoint):
+            return self.request(method, url, endpoint, **kwargs)
+
+        executor = self._hedge_executor()
+        primary = executor.submit(self.request, method, url, endpoint, **kwargs)
+        done, _ = wait([primary], timeout=self.hedge_delay(endpoint))
+        if done:
+            return primary.result()
+
+        hedge = executor.submit(self.request, method, url, endpoint, _hedge=True, **kwargs)
+        pending = {primary, hedge}
+        fallback = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except requests.exceptions.RequestException:
+                    if fallback is None:
+                        fallback = future
+                    continue
+                if response.status_code < 500 or not pending:
+                    return response
+                fallback = future
+        return fallback.result()
+
+    def probe(self):
+        """
+        Sonda de conectividad: GET liviano a api.breaker.health_endpoint
+
+        Se envía aunque el circuito esté abierto. Cualquier respuesta por
+        debajo de 500 cierra el circuito.
+
+        Returns:
+            bool: True si el servidor respondió
+        """
+        try:
+            response = self.session.get(f"{self.base_url}{self.health_path}",
+                                        timeout=self.timeout_for("health"), stream=True)
+            response.close()  # No hace falta el cuerpo
+        except requests.exceptions.RequestException:
+            return False
+        if response.status_code >= 500:
+            return False
+        self.breaker.record_success()
+        return True
+
+    def get_timings(self, endpoint=None):
+        """Tiempos registrados (más recientes al final), opcionalmente por endpoint"""
+        with self._timings_lock:
+            timings = list(self._timings)
+        if endpoint is not None:
+            timings = [t for t in timings if t["endpoint"] == endpoint]
+        return timings
+
+    def get_stats(self, endpoint=None):
+        """
+        Resumen de los tiempos registrados
+
+        Returns:
+            dict: {"count", "errors", "http_errors", "reused", "hedged",
+                   "connect_avg", "ttfb_p50", "total_p50", "total_p95"}
+                   (segundos); errors son excepciones y http_errors
+                   respuestas 5xx o 429
+        """
+        timings = self.get_timings(endpoint)
+        ok = [t for t in timings if "error" not in t]
+        totals = sorted(t["total"] for t in ok)
+        ttfbs = sorted(t["ttfb"] for t in ok)
+        connects = [t["connect"] for t in ok if not t["reused"]]
+        return {
+            "count": len(timings),
+            "errors": len(timings) - len(ok),
+            "http_errors": sum(1 for t in ok if t.get("status", 0) >= 500 or
+                               t.get("status") == 429),
+            "reused": sum(1 for t in ok if t["reused"]),
+            "hedged": sum(1 for t in timings if t.get("hedge")),
+            "connect_avg": sum(connects) / len(connects) if connects else 0.0,
+            "ttfb_p50": percentile(ttfbs, 50),
+            "total_p50": percentile(totals, 50),
+            "total_p95": percentile(totals, 95)
+        }
+
+    def close(self):
+        """Cierra las conexiones del pool"""
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+        self.session.close()
+
+
+def percentile(sorted_values, pct):
+    """Percentil (vecino más cercano) de una lista ya ordenada; 0 si está vacía"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """Transporte compartido del proceso (se crea al primer uso desde config.json)"""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = HttpTransport(load_config().get("api"))
+        return _transport
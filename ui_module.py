@@ -243,7 +243,29 @@ class StatusBar(QFrame):
             }
         """)
         
+        self.backlog_label = QLabel("")
+        self._backlog = 0
+        self._sync_rate = 0.0
+        self.backlog_label.setStyleSheet("""
+            QLabel {
+                color: #ffc107;
+                font-weight: 600;
+                font-size: 13px;
+            }
+        """)
+        
+        self.connection_label = QLabel("")
+        self.connection_label.setStyleSheet("""
+            QLabel {
+                font-weight: 600;
+                font-size: 13px;
+            }
+        """)
+        
         layout.addWidget(self.status_label)
+        layout.addStretch()
+        layout.addWidget(self.connection_label)
+        layout.addWidget(self.backlog_label)
         layout.addWidget(self.progress_bar)
         
         self.setLayout(layout)
@@ -267,11 +289,54 @@ class StatusBar(QFrame):
         """)
         self.status_label.setText(message)
     
+    def set_connection(self, state):
+        """Muestra el estado de la conexión con el servidor"""
+        states = {
+            "online": ("🟢 En línea", "#28a745"),
+            "degraded": ("🟡 Conexión inestable", "#ffc107"),
+            "offline": ("🔴 Sin conexión", "#dc3545")
+        }
+        text, color = states.get(state, ("", "#cccccc"))
+        self.connection_label.setStyleSheet(f"""
+            QLabel {{
+                color: {color};
+                font-weight: 600;
+                font-size: 13px;
+            }}
+        """)
+        self.connection_label.setText(text)
+    
+    def set_backlog(self, count):
+        """Muestra la cantidad de registros pendientes de envío"""
+        self._backlog = count
+        self._refresh_backlog()
+    
+    def set_sync_rate(self, rate):
+        """Muestra la velocidad de reenvío de pendientes (registros/s)"""
+        self._sync_rate = rate
+        self._refresh_backlog()
+    
+    def _refresh_backlog(self):
+        """Actualiza el texto del contador de pendientes"""
+        if not self._backlog:
+            self.backlog_label.setText("")
+        elif self._sync_rate > 0:
+            self.backlog_label.setText(
+                f"⏳ {self._backlog} pendiente(s) · {self._sync_rate * 60:.0f}/min")
+        else:
+            self.backlog_label.setText(f"⏳ {self._backlog} pendiente(s)")
+    
     def show_progress(self):
         """Muestra la barra de progreso"""
         self.progress_bar.setVisible(True)
         self.progress_bar.setRange(0, 0)  # Indeterminado
     
+    def set_progress(self, percent):
+        """Muestra un avance determinado (0-100) en la barra de progreso"""
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(percent)
+    
     def hide_progress(self):
         """Oculta la barra de progreso"""
         self.progress_bar.setVisible(False)
@@ -412,6 +477,8 @@ class AsistenciaUI(QMainWindow):
         
         # Botón registrar con nuevo color
         self.btn_registrar = ModernButton("📸 REGISTRAR ASISTENCIA", "#28a745")
+        self._register_idle = True  # sin registro en curso
+        self._face_present = True  # sin detección de rostro siempre es True
         self.btn_registrar.setMinimumHeight(60)
         controls_layout.addWidget(self.btn_registrar)
         
@@ -473,7 +540,15 @@ class AsistenciaUI(QMainWindow):
     
     def set_register_enabled(self, enabled):
         """Habilita/deshabilita el botón de registro"""
-        self.btn_registrar.setEnabled(enabled)
+        self._register_idle = enabled
+        self.btn_registrar.setEnabled(enabled and self._face_present)
+    
+    def set_face_present(self, present):
+        """El botón de registro solo se habilita con un rostro frente a la cámara"""
+        self._face_present = present
+        self.btn_registrar.setText("📸 REGISTRAR ASISTENCIA" if present
+                                   else "👤 MIRE A LA CÁMARA")
+        self.btn_registrar.setEnabled(self._register_idle and present)
     
     def show_message(self, title, message, message_type="information"):
         """Muestra un mensaje al usuario"""
@@ -488,11 +563,27 @@ class AsistenciaUI(QMainWindow):
         """Actualiza el estado en la barra inferior"""
         self.status_bar.set_status(message, status_type)
     
+    def update_backlog(self, count):
+        """Actualiza el contador de registros pendientes"""
+        self.status_bar.set_backlog(count)
+    
+    def update_connection(self, state):
+        """Actualiza el indicador de conexión (online, degraded u offline)"""
+        self.status_bar.set_connection(state)
+    
+    def update_sync_progress(self, processed, total, rate):
+        """Actualiza el avance del reenvío de pendientes"""
+        self.status_bar.set_sync_rate(rate if processed < total else 0.0)
+    
     def show_progress(self, message="Procesando..."):
         """Muestra progreso"""
         self.status_bar.show_progress()
         self.status_bar.set_status(message, "info")
     
+    def update_upload_progress(self, percent):
+        """Muestra el avance de la subida de la foto"""
+        self.status_bar.set_progress(percent)
+    
     def hide_progress(self):
         """Oculta progreso"""
         self.status_bar.hide_progress()
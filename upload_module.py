@@ -0,0 +1,232 @@
+"""
+Módulo de subida reanudable de fotos para el Sistema de Asistencia JOLG
+
+Sube una foto en fragmentos con reintento por fragmento. El avance se
+guarda en disco, así que una subida interrumpida (corte de red o cierre
+de la aplicación) continúa desde el último fragmento confirmado.
+
+Protocolo (servidor de prueba: servidor_simulado.py):
+- PUT {chunked_endpoint}/{upload_id} con Content-Range: bytes a-b/total
+  y el fragmento como cuerpo. Respuesta 200/201 con la ruta del archivo
+  al completar; 202/204/308 con Upload-Offset si faltan fragmentos.
+- 409 con Upload-Offset si el servidor tiene otro avance: se continúa
+  desde ese punto.
+- HEAD {chunked_endpoint}/{upload_id}: Upload-Offset confirmado por el
+  servidor (404 si no conoce la subida).
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import requests
+
+from transport_module import CircuitOpenError
+
+
+class ChunkedUploadUnsupported(Exception):
+    """
+    El servidor no tiene endpoint de subida por fragmentos
+
+    permanent=False: no se pudo confirmar (5xx en una ruta aún no probada);
+    se usa la subida completa esta vez sin descartar el protocolo.
+    """
+
+    def __init__(self, message, permanent=True):
+        super().__init__(message)
+        self.permanent = permanent
+
+
+class ChunkedUploader:
+    """Subida por fragmentos con avance persistente"""
+
+    # Respuestas 4xx que no indican falta de soporte (se reintentan)
+    RETRYABLE_4XX = (408, 409, 429)
+
+    def __init__(self, transport, endpoint_url, state_dir="temp/subidas",
+                 chunk_size=64 * 1024, retries=3, retry_delay=0.5, confirmed=False):
+        self.transport = transport
+        # El servidor ya completó una subida por fragmentos en este proceso
+        self.confirmed = confirmed
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.state_dir = state_dir
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.retry_delay = retry_delay
+        os.makedirs(state_dir, exist_ok=True)
+
+    @staticmethod
+    def upload_id_for(file_path, data=None):
+        """ID de subida: SHA-256 del contenido (estable entre reinicios)"""
+        if data is not None:
+            return hashlib.sha256(data).hexdigest()
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _state_path(self, upload_id):
+        return os.path.join(self.state_dir, f"{upload_id}.json")
+
+    def _load_state(self, upload_id, size):
+        """Avance guardado de una subida (0 si no hay o no coincide)"""
+        try:
+            with open(self._state_path(upload_id), 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get("size") == size:
+                return state.get("offset", 0)
+        except (OSError, ValueError):
+            pass
+        return 0
+
+    def _save_state(self, upload_id, file_path, size, offset):
+        """Guarda el avance de forma atómica"""
+        state = {
+            "upload_id": upload_id,
+            "file": file_path,
+            "size": size,
+            "offset": offset,
+            "updated": time.time()
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=self.state_dir, suffix=".tmp")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self._state_path(upload_id))
+
+    def _clear_state(self, upload_id):
+        try:
+            os.remove(self._state_path(upload_id))
+        except FileNotFoundError:
+            pass
+
+    def _server_offset(self, upload_id):
+        """Avance confirmado por el servidor (None si no conoce la subida)"""
+        response = self.transport.request(
+            "HEAD", f"{self.endpoint_url}/{upload_id}", endpoint="chunk")
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return int(response.headers.get("Upload-Offset", 0))
+
+    def _put_chunk(self, upload_id, filename, data, offset, size):
+        """
+        Envía un fragmento
+
+        Returns:
+            tuple: (nuevo offset, ruta final o None)
+        """
+        end = offset + len(data) - 1
+        headers = {
+            'accept': '*/*',
+            'Content-Type': 'application/octet-stream',
+            'Content-Range': f"bytes {offset}-{end}/{size}",
+            'X-Filename': filename
+        }
+        response = self.transport.request(
+            "PUT", f"{self.endpoint_url}/{upload_id}", endpoint="chunk",
+            data=data, headers=headers)
+
+        if offset == 0 and (response.status_code == 501 or (
+                400 <= response.status_code < 500 and
+                response.status_code not in self.RETRYABLE_4XX)):
+            # Un servidor sin el protocolo puede responder 400, 404, 405...
+            raise ChunkedUploadUnsupported(f"HTTP {response.status_code}")
+        if offset == 0 and response.status_code >= 500 and not self.confirmed:
+            # Ruta sin confirmar que falla: no se insiste con fragmentos
+            raise ChunkedUploadUnsupported(f"HTTP {response.status_code}", permanent=False)
+        if response.status_code == 409:
+            return int(response.headers.get("Upload-Offset", 0)), None
+        response.raise_for_status()
+
+        if response.status_code in (200, 201):
+            if offset + len(data) >= size:
+                return size, response.text.strip('"') or "files/uploaded"
+            if offset == 0:
+                # Completo antes del último fragmento: la ruta no sigue el
+                # protocolo (una ruta comodín que responde 200 a todo)
+                raise ChunkedUploadUnsupported(
+                    f"HTTP {response.status_code} antes del último fragmento")
+        return int(response.headers.get("Upload-Offset", offset + len(data))), None
+
+    def upload(self, file_path, on_progress=None, data=None):
+        """
+        Sube un archivo por fragmentos, continuando una subida previa
+
+        Args:
+            file_path (str): Ruta del archivo
+            on_progress (callable): on_progress(porcentaje: int)
+            data (bytes): Contenido ya en memoria; si se indica, no se lee
+                file_path (solo se usa su nombre)
+
+        Returns:
+            tuple: (success: bool, result: str) - ruta del archivo subido o error
+
+        Raises:
+            ChunkedUploadUnsupported: Si el servidor no acepta fragmentos
+        """
+        if data is None:
+            if not os.path.exists(file_path):
+                return False, "Archivo no encontrado"
+            size = os.path.getsize(file_path)
+        else:
+            size = len(data)
+        if not size:
+            return False, "Archivo vacío"
+        upload_id = self.upload_id_for(file_path, data)
+        filename = os.path.basename(file_path)
+        offset = self._load_state(upload_id, size)
+
+        if offset:
+            # Reanudación: el avance del servidor manda sobre el guardado
+            try:
+                server_offset = self._server_offset(upload_id)
+                offset = server_offset if server_offset is not None else 0
+            except requests.exceptions.RequestException as e:
+                return False, f"Error de conexión: {str(e)}"
+
+        if data is not None:
+            return self._send(upload_id, file_path, filename, data, size, offset, on_progress)
+        with open(file_path, 'rb') as f:
+            return self._send(upload_id, file_path, filename, f, size, offset, on_progress)
+
+    def _send(self, upload_id, file_path, filename, source, size, offset, on_progress):
+        """Envía los fragmentos desde offset; source es un archivo abierto o bytes"""
+        failures = 0
+        while True:
+            if on_progress:
+                on_progress(int(offset * 100 / size))
+            if isinstance(source, bytes):
+                data = source[offset:offset + self.chunk_size]
+            else:
+                source.seek(offset)
+                data = source.read(self.chunk_size)
+            try:
+                new_offset, result = self._put_chunk(upload_id, filename, data, offset, size)
+            except CircuitOpenError as e:
+                # Circuito abierto: no tiene sentido esperar y reintentar
+                return False, f"Error de conexión: {str(e)}"
+            except requests.exceptions.RequestException as e:
+                failures += 1
+                if failures > self.retries:
+                    # El avance queda guardado para el próximo intento
+                    return False, f"Error de conexión: {str(e)}"
+                time.sleep(self.retry_delay * (2 ** (failures - 1)))
+                try:
+                    server_offset = self._server_offset(upload_id)
+                    offset = server_offset if server_offset is not None else 0
+                except requests.exceptions.RequestException:
+                    pass
+                continue
+
+            failures = 0
+            if result is not None:
+                self._clear_state(upload_id)
+                if on_progress:
+                    on_progress(100)
+                return True, result
+
+            offset = new_offset
+            self._save_state(upload_id, file_path, size, offset)